@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark of the scaling of cosmoFuncs.evaluate_grid() with the number of worker processes.
+
+Usage : python benchmarks/bench_grid.py [--n-params N] [--n-z N] [--workers 1,2,4,...] [--json FILE]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import cosmoFuncs as cf  # noqa: E402
+
+
+def run(n_params, n_z, workers_list, quantity='luminosity_distance', seed=0):
+    """
+    Time evaluate_grid() over a random grid of parameters and redshifts for each number of workers, and
+    return a list of dicts with the wall time, throughput, speedup and parallel efficiency.
+    """
+    rng = np.random.default_rng(seed)
+    params_list = [[H, lam, m] for H, lam, m in zip(rng.uniform(50, 90, n_params),
+                                                    rng.uniform(0.0, 1.0, n_params),
+                                                    rng.uniform(0.1, 0.5, n_params))]
+    z = rng.uniform(0, 5, n_z)
+    results = []
+    for workers in workers_list:
+        cf.clear_cache()
+        start = time.perf_counter()
+        cf.evaluate_grid(params_list, z, quantity=quantity, workers=workers)
+        elapsed = time.perf_counter() - start
+        results.append({'workers': workers, 'seconds': elapsed,
+                        'values_per_second': n_params * n_z / elapsed})
+    for result in results:
+        result['speedup'] = results[0]['seconds'] / result['seconds'] * workers_list[0]
+        result['efficiency'] = result['speedup'] / result['workers']
+    return(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--n-params', type=int, default=64, help="number of parameter sets")
+    parser.add_argument('--n-z', type=int, default=200000, help="number of redshifts")
+    parser.add_argument('--workers', default=None,
+                        help="comma separated numbers of workers (default : powers of 2 up to the CPU count)")
+    parser.add_argument('--quantity', default='luminosity_distance', choices=cf.GRID_QUANTITIES)
+    parser.add_argument('--json', default=None, help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    if args.workers:
+        workers_list = [int(w) for w in args.workers.split(',')]
+    else:
+        n_cpu = os.cpu_count() or 1
+        workers_list = sorted({2 ** i for i in range(n_cpu.bit_length()) if 2 ** i <= n_cpu} | {n_cpu})
+    results = run(args.n_params, args.n_z, workers_list, args.quantity)
+    print("{:>8} {:>10} {:>14} {:>8} {:>10}".format('workers', 'seconds', 'values/s', 'speedup', 'efficiency'))
+    for r in results:
+        print("{workers:>8} {seconds:>10.3f} {values_per_second:>14.4g} {speedup:>8.2f} {efficiency:>10.2f}".format(**r))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'benchmark': 'evaluate_grid', 'n_params': args.n_params, 'n_z': args.n_z,
+                       'quantity': args.quantity, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Validation and timing of the single-redshift integrators of cosmoFuncs ('gauss' against 'quad').
+
+For a set of flat, open, closed and extreme cosmologies and redshifts from -0.3 to 1e5, the radial and age
+integrals computed with the Gauss-Legendre rules at each accuracy are compared to quad run at a tolerance of
+1e-13, and the mean time per integral of both integrators is reported. The exit status is 1 if any relative
+error exceeds the requested accuracy.
+
+Usage : python benchmarks/bench_integrators.py [--accuracy 1e-6,1e-8,...] [--json FILE]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import cosmoFuncs as cf  # noqa: E402
+
+COSMOLOGIES = [[70.0, 0.7, 0.3], [67.66, 0.6889, 0.3111], [70.0, 0.9, 0.3], [70.0, 0.0, 0.3],
+               [70.0, 0.2, 0.3], [70.0, 0.05, 0.01], [70.0, 0.7, 1e-3], [50.0, 0.3, 2.0]]
+REDSHIFTS = [-0.3, 1e-6, 1e-3, 0.1, 1.0, 3.0, 10.0, 100.0, 1100.0, 1e5]
+
+
+def _integrals(method, accuracy):
+    """
+    Compute the radial and age integrals for every cosmology and redshift, and the mean time per integral.
+    """
+    cf.set_integrator(method, accuracy)
+    values = []
+    start = time.perf_counter()
+    for parameters in COSMOLOGIES:
+        cosmo = cf.Cosmology(*parameters)
+        for z in REDSHIFTS:
+            values.append((cosmo._radial_scalar(z), cosmo._age_scalar(z)))
+    elapsed = time.perf_counter() - start
+    return(np.array(values), elapsed / (2 * len(values)))
+
+
+def run(accuracies):
+    """
+    Compare the 'gauss' integrator at each accuracy to a tight quad, and time both at that accuracy.
+    """
+    reference, _ = _integrals('quad', 1e-13)
+    results = []
+    for accuracy in accuracies:
+        values, gauss_time = _integrals('gauss', accuracy)
+        _, quad_time = _integrals('quad', accuracy)
+        error = float(np.nanmax(np.abs(values / reference - 1)))
+        results.append({'accuracy': accuracy, 'max_rel_error': error, 'gauss_s': gauss_time,
+                        'quad_s': quad_time, 'speedup': quad_time / gauss_time, 'ok': error <= accuracy})
+    cf.set_integrator('quad', 1.49e-8)
+    return(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--accuracy', default='1e-6,1e-8,1e-10,1e-12',
+                        help="comma separated accuracies to validate")
+    parser.add_argument('--json', default=None, help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run([float(a) for a in args.accuracy.split(',')])
+    print("{:>10} {:>14} {:>12} {:>12} {:>8}".format('accuracy', 'max rel error', 'gauss (s)', 'quad (s)',
+                                                     'speedup'))
+    for r in results:
+        print("{accuracy:>10.0e} {max_rel_error:>14.3g} {gauss_s:>12.3g} {quad_s:>12.3g} {speedup:>8.2f}".format(**r)
+              + ('' if r['ok'] else '  FAILED'))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'benchmark': 'integrators', 'results': results}, f, indent=2)
+    sys.exit(0 if all(r['ok'] for r in results) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Validation and timing of the numba-compiled integration kernel of cosmoFuncs against the NumPy one.
+
+For a set of flat, open, closed and w0-wa cosmologies, the array path (comoving_distance_radial, t and
+lightTravelTime on random redshifts, whose integrals go through _segment_integrals) is run with the NumPy
+kernel and with the compiled one (see set_jit), and the best time of each, the time of the first compiled call
+(which includes the compilation) and the largest relative difference are reported. The exit status is 1 if
+the kernels disagree by more than the tolerance, and 2 if numba is not installed. The compiled kernel is off
+by default, and should only be turned on where this shows a speedup.
+
+Usage : python benchmarks/bench_jit.py [--n 1000000] [--repeat 5] [--tolerance 1e-12] [--json FILE]
+"""
+import argparse
+import importlib.util
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import cosmoFuncs as cf  # noqa: E402
+
+COSMOLOGIES = [[70.0, 0.7, 0.3], [70.0, 0.9, 0.3], [70.0, 0.2, 0.3], [70.0, 0.7, 0.3, -0.9, 0.2]]
+QUANTITIES = ('comoving_distance_radial', 't', 'lightTravelTime')
+
+
+def _best(func, repeat):
+    """
+    The result of func() and the best time of repeat calls.
+    """
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        value = func()
+        best = min(best, time.perf_counter() - start)
+    return(value, best)
+
+
+def run(n, repeat, tolerance):
+    """
+    Time the array path of every cosmology with both kernels, and compare their results.
+    """
+    rng = np.random.default_rng(0)
+    z = rng.uniform(0, 5, n)
+    enabled = cf._JIT['enabled']
+    results = []
+    try:
+        for parameters in COSMOLOGIES:
+            cosmo = cf.get_cosmology(parameters)
+            for quantity in QUANTITIES:
+                func = getattr(cosmo, quantity)
+                cf.set_jit(False)
+                reference, numpy_s = _best(lambda: func(z), repeat)
+                cf.set_jit(True)
+                start = time.perf_counter()
+                func(z)
+                first_s = time.perf_counter() - start
+                value, jit_s = _best(lambda: func(z), repeat)
+                error = float(np.max(np.abs(value / reference - 1)))
+                results.append({'parameters': parameters, 'quantity': quantity, 'numpy_s': numpy_s,
+                                'jit_first_s': first_s, 'jit_s': jit_s, 'speedup': numpy_s / jit_s,
+                                'max_rel_error': error, 'ok': error <= tolerance})
+    finally:
+        cf._JIT['enabled'] = enabled
+    return(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--n', type=int, default=1000000, help="number of random redshifts (default : 1000000)")
+    parser.add_argument('--repeat', type=int, default=5, help="timed calls per kernel (default : 5)")
+    parser.add_argument('--tolerance', type=float, default=1e-12,
+                        help="largest relative difference allowed (default : 1e-12)")
+    parser.add_argument('--json', default=None, help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    if importlib.util.find_spec('numba') is None:
+        print("numba is not installed, there is no compiled kernel to compare.")
+        sys.exit(2)
+    results = run(args.n, args.repeat, args.tolerance)
+    print("{:<32} {:<26} {:>10} {:>12} {:>10} {:>8} {:>12}".format(
+        'parameters', 'quantity', 'numpy (s)', 'first (s)', 'jit (s)', 'speedup', 'max rel diff'))
+    for r in results:
+        print("{!s:<32} {quantity:<26} {numpy_s:>10.3g} {jit_first_s:>12.3g} {jit_s:>10.3g} {speedup:>8.2f} "
+              "{max_rel_error:>12.3g}".format(r['parameters'], **r) + ('' if r['ok'] else '  FAILED'))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'benchmark': 'jit', 'n': args.n, 'results': results}, f, indent=2)
+    sys.exit(0 if all(r['ok'] for r in results) else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Validation and timing of the reduced precision (float32) table lookups of cosmoFuncs against float64.
+
+For a set of flat, open, closed and w0-wa cosmologies, every quantity of a float32 CosmologyTable (see
+CosmologyTable.astype) is compared to direct float64 integration at the same (float32) redshifts, from
+1e-5 to 1100, as well as at single redshifts inside and outside the table (where the lookups fall back to
+integration), and the lookup time and output size of both precisions are reported. The exit status is 1 if
+any relative error (or any distance modulus error, in mag) exceeds the tolerance.
+
+Usage : python benchmarks/bench_precision.py [--n 1000000] [--tolerance 1e-5] [--json FILE]
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import cosmoFuncs as cf  # noqa: E402
+
+COSMOLOGIES = [[70.0, 0.7, 0.3], [67.66, 0.6889, 0.3111], [70.0, 0.9, 0.3], [70.0, 0.2, 0.3],
+               [70.0, 0.0, 1.0], [70.0, 0.7, 0.3, -0.9, 0.2]]
+SCALAR_REDSHIFTS = (-0.5, 0.5, 2000.0)  # single redshifts, below, inside and above the table
+QUANTITIES = ('comoving_distance_radial', 'comoving_distance_transverse', 'comoving_volume',
+              'angulardiameter_distance', 'linear_scale', 'luminosity_distance', 'distance_modulus', 't',
+              'lightTravelTime')
+
+
+def run(n, tolerance):
+    """
+    Compare the float32 tables of every cosmology to float64 integration, and time both lookups.
+    """
+    rng = np.random.default_rng(0)
+    z = np.concatenate((rng.uniform(0, 5, n), np.geomspace(1e-5, 1100, n // 10))).astype(np.float32)
+    results = []
+    for parameters in COSMOLOGIES:
+        cosmo = cf.get_cosmology(parameters)
+        table = cf.CosmologyTable(parameters)
+        reduced = table.astype(np.float32)
+        errors = {}
+        for quantity in QUANTITIES:
+            value = getattr(reduced, quantity)(z)
+            reference = getattr(cosmo, quantity)(z.astype(float))
+            if quantity == 'distance_modulus':
+                errors[quantity] = float(np.max(np.abs(value - reference)))
+            else:
+                errors[quantity] = float(np.max(np.abs(value / reference - 1)))
+            for z_single in SCALAR_REDSHIFTS:
+                if quantity == 'distance_modulus' and z_single < 0:
+                    continue  # undefined for blueshifts
+                value, reference = getattr(reduced, quantity)(z_single), getattr(cosmo, quantity)(z_single)
+                error = abs(value - reference) if quantity == 'distance_modulus' else abs(value / reference - 1)
+                # a single redshift must give a float32 scalar, not fail or come back in double precision
+                if np.ndim(value) != 0 or np.asarray(value).dtype != np.float32:
+                    error = np.inf
+                errors[quantity] = max(errors[quantity], float(error))
+        errors['compute_all'] = 0.0
+        for z_single in SCALAR_REDSHIFTS:
+            outputs = cf.compute_all(parameters, z_single, 'table', np.float32)
+            reference = cosmo.compute_all(z_single)
+            for name, value in outputs.items():
+                if name in ('age_0', 'paths'):
+                    continue
+                error = abs(value / reference[name] - 1) if np.asarray(value).dtype == np.float32 else np.inf
+                errors['compute_all'] = max(errors['compute_all'], float(error))
+        timings = {}
+        for name, source, z_in in (('float64', table, z.astype(float)), ('float32', reduced, z)):
+            start = time.perf_counter()
+            out = source.luminosity_distance(z_in)
+            timings[name] = {'seconds': time.perf_counter() - start, 'bytes': out.nbytes}
+        results.append({'parameters': parameters, 'max_errors': errors,
+                        'table_max_rel_error': reduced.max_rel_error, 'timings': timings,
+                        'ok': max(errors.values()) <= tolerance})
+    return(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--n', type=int, default=1000000, help="number of random redshifts (default : 1000000)")
+    parser.add_argument('--tolerance', type=float, default=1e-5, help="largest error allowed (default : 1e-5)")
+    parser.add_argument('--json', default=None, help="also write the results to this JSON file")
+    args = parser.parse_args()
+
+    results = run(args.n, args.tolerance)
+    for r in results:
+        worst = max(r['max_errors'], key=r['max_errors'].get)
+        t64, t32 = r['timings']['float64'], r['timings']['float32']
+        print("{!s:<32} max error {:.2g} ({}), d_L lookup {:.3g} s / {:.3g} s, {} / {} MB".format(
+            r['parameters'], r['max_errors'][worst], worst, t64['seconds'], t32['seconds'],
+            t64['bytes'] // 2 ** 20, t32['bytes'] // 2 ** 20) + ('' if r['ok'] else '  FAILED'))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'benchmark': 'precision', 'tolerance': args.tolerance, 'results': results}, f, indent=2)
+    sys.exit(0 if all(r['ok'] for r in results) else 1)
+
+
+if __name__ == '__main__':
+    main()
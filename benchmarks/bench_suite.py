@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Reproducible benchmark suite for cosmoFuncs and the Flask request path.
+
+It measures the single-call latency of every cosmoFuncs function at low and high redshift for flat, open
+and closed cosmologies (with cold and warm caches), the throughput of the array path in objects per second,
+the end-to-end latency of a POST to home() through the Flask test client, and the cold-start latency of
+importing cosmoFuncs and flask_app (and of the first call after the import) in fresh interpreters. The
+results are written as JSON, and --compare prints the ratio of every timing to an earlier run.
+
+Usage : python benchmarks/bench_suite.py [--quick] [--json FILE] [--compare OLD.json]
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import scipy
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, ROOT)
+import cosmoFuncs as cf  # noqa: E402
+
+COSMOLOGIES = {'flat': [70.0, 0.7, 0.3], 'open': [70.0, 0.0, 0.3], 'closed': [70.0, 0.9, 0.3]}
+REDSHIFTS = {'low': 0.5, 'high': 1000.0}
+FUNCTIONS = ['t', 'lightTravelTime', 'comoving_distance_radial', 'comoving_distance_transverse',
+             'comoving_volume', 'angulardiameter_distance', 'linear_scale', 'luminosity_distance']
+TIME_FUNCTIONS = ('t', 'lightTravelTime')  # these take H_0 in 1/s
+BUTTONS = {'flat': 'Flat', 'open': 'Open', 'closed': 'General'}
+
+
+def _parameters(name, function):
+    H, lam, m = COSMOLOGIES[name]
+    return([cf.convertH(H) if function in TIME_FUNCTIONS else H, lam, m])
+
+
+def timed(func, repeat, setup=None):
+    """
+    Call func repeat times (calling setup before each call, outside the timing) and return the median and
+    minimum wall time in seconds.
+    """
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return({'median_s': statistics.median(times), 'min_s': min(times), 'repeat': repeat})
+
+
+def bench_single_call(repeat):
+    results = []
+    for cosmo in COSMOLOGIES:
+        for z_name, z in REDSHIFTS.items():
+            for function in FUNCTIONS:
+                params = _parameters(cosmo, function)
+                func = getattr(cf, function)
+                for cache in ('cold', 'warm'):
+                    setup = cf.clear_cache if cache == 'cold' else None
+                    func(params, z)
+                    result = timed(lambda: func(params, z), repeat, setup)
+                    result.update(id='single/{}/{}/{}/{}'.format(function, cosmo, z_name, cache))
+                    results.append(result)
+    return(results)
+
+
+def bench_array(sizes, repeat):
+    results = []
+    rng = np.random.default_rng(0)
+    for size in sizes:
+        z = rng.uniform(0, 5, size)
+        for cosmo in COSMOLOGIES:
+            for function in ('luminosity_distance', 't'):
+                params = _parameters(cosmo, function)
+                func = getattr(cf, function)
+                result = timed(lambda: func(params, z), repeat, cf.clear_cache)
+                result.update(id='array/{}/{}/{}'.format(function, cosmo, size),
+                              objects_per_s=size / result['median_s'])
+                results.append(result)
+    return(results)
+
+
+def bench_flask(repeat):
+    # keep the shared result cache of the app in a scratch file, emptied along with the in-process caches
+    os.environ['COSMOCALC_CACHE'] = os.path.join(tempfile.mkdtemp(), 'results.sqlite')
+    import flask_app
+    client = flask_app.app.test_client()
+
+    def clear():
+        cf.clear_cache()
+        flask_app._get_result_cache().clear()
+    results = []
+    for cosmo, button in BUTTONS.items():
+        H, lam, m = COSMOLOGIES[cosmo]
+        form = {'redshift': '3', 'hubblepar': str(H), 'omega_m': str(m), 'omega_vac': str(lam),
+                'submit_button': button}
+
+        def post():
+            response = client.post('/', data=form)
+            assert response.status_code == 200, response.status_code
+        for cache in ('cold', 'warm'):
+            post()
+            result = timed(post, repeat, clear if cache == 'cold' else None)
+            result.update(id='flask/home/{}/{}'.format(cosmo, cache))
+            results.append(result)
+    return(results)
+
+
+# The cold starts timed by bench_import(), each one the statement run (and timed) in a fresh interpreter
+COLD_STARTS = {'cosmoFuncs': 'import cosmoFuncs',
+               'flask_app': 'import flask_app',
+               'cosmoFuncs+first_call': 'import cosmoFuncs; cosmoFuncs.luminosity_distance([70, 0.7, 0.3], 1.0)',
+               'flask_app+first_request': 'import flask_app; flask_app.app.test_client().post("/", data={'
+                                          '"redshift": "3", "hubblepar": "70", "omega_m": "0.3", '
+                                          '"omega_vac": "0.7", "submit_button": "Flat"})'}
+
+
+def bench_import(repeat):
+    """
+    Time every cold start of COLD_STARTS repeat times, each in a new Python process (so that nothing is
+    already imported), measuring inside the process to leave out the startup of the interpreter itself.
+    """
+    env = dict(os.environ, COSMOCALC_CACHE='')
+    results = []
+    for name, statement in COLD_STARTS.items():
+        code = ("import sys, time\nsys.path.insert(0, {!r})\nstart = time.perf_counter()\n{}\n"
+                "print(time.perf_counter() - start)".format(ROOT, statement))
+        times = []
+        for _ in range(repeat):
+            out = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, capture_output=True, text=True,
+                                 check=True).stdout
+            times.append(float(out.split()[-1]))
+        results.append({'id': 'import/{}'.format(name), 'median_s': statistics.median(times), 'min_s': min(times),
+                        'repeat': repeat})
+    return(results)
+
+
+def metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return({'commit': commit, 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(), 'numpy': np.__version__, 'scipy': scipy.__version__,
+            'platform': platform.platform(), 'cpu_count': os.cpu_count()})
+
+
+def compare(results, old):
+    """
+    Print the ratio new / old of the median time of every benchmark present in both runs.
+    """
+    old_times = {r['id']: r['median_s'] for r in old['results']}
+    print("{:<60} {:>12} {:>12} {:>8}".format('benchmark', 'old (s)', 'new (s)', 'ratio'))
+    for r in results:
+        if r['id'] in old_times:
+            print("{:<60} {:>12.4g} {:>12.4g} {:>8.2f}".format(
+                r['id'], old_times[r['id']], r['median_s'], r['median_s'] / old_times[r['id']]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--quick', action='store_true', help="fewer repeats and smaller arrays")
+    parser.add_argument('--json', default=None, help="write the results to this JSON file (default : stdout)")
+    parser.add_argument('--compare', default=None, help="JSON file of an earlier run to compare against")
+    args = parser.parse_args()
+
+    repeat = 5 if args.quick else 25
+    sizes = [10 ** 4, 10 ** 5] if args.quick else [10 ** 4, 10 ** 5, 10 ** 6]
+    results = (bench_import(max(3, repeat // 5)) + bench_single_call(repeat) + bench_array(sizes, max(3, repeat // 5))
+               + bench_flask(repeat))
+    report = {'meta': metadata(), 'results': results}
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+    elif not args.compare:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -5,17 +5,76 @@ Created on Tue Mar 31 21:46:31 2020
 
 @author: Bharath Saiguhan
 """
+import cmath
+import functools
+import importlib.util
+import json
+import os
+import threading
+import time
+import warnings
+from collections import OrderedDict
+from contextlib import contextmanager
+
 import numpy as np
-from scipy.constants import pi, c, G
-from scipy.integrate import quad
 
+# The constants of scipy.constants (CODATA 2018), written out so that importing this module does not import it
+pi = 3.141592653589793
+c = 299792458.0  # speed of light in m/s
+G = 6.6743e-11  # gravitational constant in m^3/kg/s^2
 
 c = c / 1000.0  # get the value of the speed of light in km/s
 arcsec = pi / (3600 * 180)  # conversion from " to radians
+FULL_SKY = 4 * pi * (180 / pi) ** 2  # area of the full sky, in square degrees
 
 # Note : We hardcode omega_rad_0 to 4.165e(-5), and omega_k is computed
 #        according to omega_k + omega_m + omega_lam + omega_rad_0 = 1
 #        We will only input the values of H_0, omega_m and omega_lam.
+#
+# Note : Every function below accepts either a single redshift or an array of
+#        redshifts. Arrays are handled by one cumulative integral over the
+#        sorted redshifts (see _cumulative_integral), instead of one call to
+#        quad per element, and agree with the scalar path to a relative
+#        tolerance of 1e-8.
+#
+# Note : The functions below are thin wrappers around the Cosmology class,
+#        whose instances (and their integrals at single redshifts) are kept
+#        in process-wide LRU caches, see get_cosmology() and cache_info().
+#
+# Note : Whenever the parameters allow it, the integrals are evaluated with
+#        closed forms (elementary functions when omega_lam = 0, Carlson's
+#        elliptic R_F for the comoving distance otherwise) instead of quad,
+#        see Cosmology._choose_paths() and integration_paths(). The others
+#        use quad, or Gauss-Legendre rules with set_integrator('gauss').
+#
+# Note : Dark energy with w(z) = w_0 + w_a z/(1 + z) is given by two more
+#        entries in parameters, [H_0, omega_lam, omega_m, w_0, w_a], and is
+#        handled by CosmologyW0Wa throughout, see get_cosmology().
+#
+# Note : The tables of the named cosmologies in PRESETS are shipped in the
+#        presets/ directory (see build_presets()) and memory-mapped on import,
+#        so get_table() and compute_all(..., method='table') never integrate
+#        anything for them.
+#
+# Note : The heavy dependencies (scipy.integrate, scipy.interpolate,
+#        scipy.special, scipy.spatial, numba and the multiprocessing tools)
+#        are imported on first use rather than with this module, so that
+#        importing it stays fast, see quad() and solve_ivp() below.
+#
+# Note : enable_instrumentation() and instrument() record call counts and
+#        wall times of the public functions, along with the work done by the
+#        integrators. They swap the module globals for counting wrappers, so
+#        there is no cost at all while instrumentation is disabled.
+
+_GL_ORDER = 8  # number of Gauss-Legendre nodes per integration segment
+_GL_NODES, _GL_WEIGHTS = np.polynomial.legendre.leggauss(_GL_ORDER)
+_LN_STEP = 0.05  # widest allowed segment, in units of ln(1 + z)
+_CHUNK = 2 ** 16  # number of segments evaluated at once, to bound memory
+
+# The integrator used for the numerical integrals at single redshifts, see set_integrator()
+_INTEGRATOR = {'method': 'quad', 'accuracy': 1.49e-8}
+_GAUSS_MIN_ORDER = 16
+_GAUSS_MAX_ORDER = 1024
 
 
 def convertH(H):
@@ -54,172 +113,833 @@ def HubbleDistance(H):
     return d_H
 
 
-def t(parameters, z_val):
+def quad(func, a, b, *args, **kwargs):
+    """scipy.integrate.quad, imported on first use (instrumentation swaps this global, see _counting_quad)."""
+    from scipy.integrate import quad as scipy_quad
+    return(scipy_quad(func, a, b, *args, **kwargs))
+
+
+def solve_ivp(*args, **kwargs):
+    """scipy.integrate.solve_ivp, imported on first use (see _counting_solve_ivp)."""
+    from scipy.integrate import solve_ivp as scipy_solve_ivp
+    return(scipy_solve_ivp(*args, **kwargs))
+
+
+def elliprf(x, y, z):
+    """scipy.special.elliprf, Carlson's symmetric elliptic integral R_F, imported on first use."""
+    from scipy.special import elliprf as scipy_elliprf
+    return(scipy_elliprf(x, y, z))
+
+
+def _segment_kernel(edges, nodes, weights, power, omega_lam, omega_k, omega_m, omega_rad, w_0, w_a):
     """
-    A function to calculate age of Universe at the given redshift of z_val.
+    A helper function integrating (1 + z)^power / E(z) over every segment between consecutive values of
+    x = ln(1 + z) in edges, with the Gauss-Legendre rule given by nodes and weights, one segment at a time.
+    This is the loop compiled by numba (in parallel over the segments) when enabled with set_jit().
+    """
+    seg = np.empty(len(edges) - 1)
+    constant = w_0 == -1.0 and w_a == 0.0
+    for i in _prange(len(seg)):
+        half = (edges[i + 1] - edges[i]) / 2
+        mid = (edges[i + 1] + edges[i]) / 2
+        total = 0.0
+        for j in range(len(nodes)):
+            x = mid + half * nodes[j]
+            zp1 = np.exp(x)
+            omega_de = omega_lam
+            if not constant:
+                omega_de = omega_lam * np.exp(3 * (1 + w_0 + w_a) * x + 3 * w_a * (1 / zp1 - 1))
+            inv_E = 1 / np.sqrt(omega_de + zp1 ** 2 * (omega_k + zp1 * (omega_m + omega_rad * zp1)))
+            total += weights[j] * (zp1 * inv_E if power == 1 else inv_E)
+        seg[i] = half * total
+    return(seg)
+
+
+_prange = range
+# off by default, as it is not faster than NumPy everywhere (see benchmarks/bench_jit.py), and numba itself is
+# only imported (and the kernel compiled) the first time the kernel is used
+_JIT = {'enabled': False, 'kernel': None}
+
+
+def _segment_kernel_jit(*args):
+    """
+    A helper function calling _segment_kernel compiled by numba, importing numba and compiling it first.
+    """
+    global _prange
+    if _JIT['kernel'] is None:
+        import numba
+        _prange = numba.prange
+        _JIT['kernel'] = numba.njit(parallel=True, cache=True)(_segment_kernel)
+    return(_JIT['kernel'](*args))
+
+
+def set_jit(enabled):
+    """
+    A function to choose whether the array path integrates with the numba-compiled kernel or with NumPy (the
+    default). python benchmarks/bench_jit.py shows whether the compiled kernel is faster on a given machine.
+    Without numba, enabling it warns and leaves the NumPy kernel in use.
 
     Arguments
     ---------
-    parameters : list of length 3
-        A list containing the cosmological parameters, with:
-        parameter[0] = H_0 (in units of 1/s)
-        parameter[1] = omega_lam_0
-        parameter[2] = omega_m_0
-
-    z_val : float
-        A value for the redshift.
+    enabled : bool
+        Whether to use the compiled kernel.
 
     Returns
     -------
-    t_age : float
-        A value for the Age of the Universe (in Gyr) at redshift z = z_val.
+    enabled : bool
+        Whether the compiled kernel is used from now on.
 
     """
-    h = parameters[0] * (3.086e22) / 100000  # normalized Hubble's constant
-    omega_rad = 4.165e-5 / (h ** 2)
-    omega_k = 1 - sum(parameters[1:]) - omega_rad
-    def integrand(z): return 1 / ((1 + z) *
-                                  (parameters[0] * np.sqrt((parameters[1] + parameters[2] * (1 + z) ** 3 + omega_k * (1 + z) ** 2 + omega_rad * (1 + z) ** 4))))
-    t_age = quad(integrand, z_val, np.inf)[0] / (86400 * 365 * 1e9)
-    return(t_age)
+    if enabled and importlib.util.find_spec('numba') is None:
+        warnings.warn("numba is not installed, the NumPy kernel is used instead.", RuntimeWarning, stacklevel=2)
+        enabled = False
+    _JIT['enabled'] = bool(enabled)
+    return(_JIT['enabled'])
 
 
-def lightTravelTime(parameters, z_val):
+class _LnIntegrand:
+    """
+    The integrand (1 + z)^power / E(z) of the integrals over x = ln(1 + z) of a Cosmology, power being 1 for
+    the comoving distance and 0 for the lookback time and age. Unlike a lambda, it can hand its parameters
+    to the compiled kernel.
     """
-    A function to calculate the Light Travel Time from redshift z = z_val to z = 0.
+
+    def __init__(self, cosmo, power):
+        self.cosmo = cosmo
+        self.power = power
+
+    def __call__(self, x):
+        zp1 = np.exp(x)
+        inv_E = self.cosmo.inv_E(zp1)
+        return(zp1 * inv_E if self.power == 1 else inv_E)
+
+    def kernel_args(self):
+        """The arguments of _segment_kernel after the rule, or None if E(z) is not one it computes."""
+        cosmo = self.cosmo
+        if type(cosmo) not in (Cosmology, CosmologyW0Wa):
+            return(None)
+        return((self.power, cosmo.omega_lam, cosmo.omega_k, cosmo.omega_m, cosmo.omega_rad,
+                getattr(cosmo, 'w_0', -1.0), getattr(cosmo, 'w_a', 0.0)))
+
+
+def _segment_integrals(integrand, edges):
+    """
+    A helper function to integrate over every segment between consecutive values in edges, using
+    fixed-order Gauss-Legendre quadrature. _LnIntegrand integrands go through the compiled kernel when it
+    is enabled.
 
     Arguments
     ---------
-    parameters : list of length 3
-        A list containing the cosmological parameters, with:
-        parameter[0] = H_0 (in units of 1/s)
-        parameter[1] = omega_lam_0
-        parameter[2] = omega_m_0
+    integrand : callable
+        A vectorized function of x = ln(1 + z).
 
-    z_val : float
-        A value for the redshift.
+    edges : ndarray
+        Sorted values of x, the boundaries of the segments.
 
     Returns
     -------
-    ltt : float
-        The Light Travel Time (in Gyr) corresponding to the Cosmological parameters given, from the redshift z = z_val
-        to z = 0.
+    seg : ndarray
+        The integral over each of the len(edges) - 1 segments.
 
     """
-    ltt = t(parameters, 0.0) - t(parameters, z_val)
-    return(ltt)
+    if _JIT['enabled'] and isinstance(integrand, _LnIntegrand) and integrand.kernel_args() is not None:
+        return(_segment_kernel_jit(edges, _GL_NODES, _GL_WEIGHTS, *integrand.kernel_args()))
+    seg = np.empty(len(edges) - 1)
+    for start in range(0, len(seg), _CHUNK):
+        a = edges[start:start + _CHUNK + 1]
+        half = (a[1:] - a[:-1]) / 2
+        nodes = (a[1:] + a[:-1])[:, None] / 2 + half[:, None] * _GL_NODES
+        seg[start:start + len(half)] = half * (integrand(nodes) @ _GL_WEIGHTS)
+    return(seg)
 
 
-def comoving_distance_radial(parameters, z_val):
+@functools.lru_cache(maxsize=None)
+def _gauss_rule(n):
     """
-    A function to compute the (radial) comoving distance, given the cosmological parameters and a value
-    for redshift.
+    A helper function returning the nodes and weights of the n-point Gauss-Legendre rule on [0, 1].
+    """
+    nodes, weights = np.polynomial.legendre.leggauss(n)
+    return((nodes + 1) / 2, weights / 2)
+
+
+def _gauss_integral(integrand, a, b, accuracy):
+    """
+    A helper function to integrate a smooth function over [a, b] with Gauss-Legendre rules of increasing
+    order, each evaluated with a single vectorized call to integrand. The order is doubled (from
+    _GAUSS_MIN_ORDER up to _GAUSS_MAX_ORDER) until two successive rules agree to a relative error of
+    accuracy, and the higher order value is returned.
 
     Arguments
     ---------
-    parameters : list of length 3
-        A list containing the cosmological parameters, with:
-        parameter[0] = H_0 (in units of km/s/Mpc)
-        parameter[1] = omega_lam_0
-        parameter[2] = omega_m_0
+    integrand : callable
+        A vectorized function.
 
-    z_val : float
-        A value for the redshift.
+    a, b : float
+        The limits of integration.
+
+    accuracy : float
+        The relative tolerance.
 
     Returns
     -------
-    d_c : float
-        The (Radial) Comoving Distance (in Mpc) corresponding to the Cosmological parameters given, at the redshift z_val.
+    integral : float or None
+        The integral, or None if the rules did not converge.
 
     """
-    h = parameters[0] / 100  # normalized Hubble's constant
-    omega_rad = 4.165e-5 / (h ** 2)
-    omega_k = 1 - sum(parameters[1:]) - omega_rad
+    previous = None
+    n = _GAUSS_MIN_ORDER
+    while n <= _GAUSS_MAX_ORDER:
+        nodes, weights = _gauss_rule(n)
+        value = (b - a) * float(integrand(a + (b - a) * nodes) @ weights)
+        if previous is not None and abs(value - previous) <= accuracy * abs(value):
+            return(value)
+        previous = value
+        n *= 2
+    return(None)
 
-    def denom(z): return 1 / \
-        (parameters[0] * np.sqrt((parameters[1] + parameters[2] * (1 + z)
-                                  ** 3 + omega_k * (1 + z) ** 2 + omega_rad * (1 + z) ** 4)))
-    return(c * quad(denom, 0, z_val)[0])
 
-
-def comoving_distance_transverse(parameters, z_val):
+def _cumulative_integral(integrand, z_val, tail=None):
     """
-    A function to compute the (transverse) comoving distance, given the cosmological parameters and a value
-    for redshift.
+    A helper function to compute integrals of integrand(x) dx, x = ln(1 + z), for an array of redshifts
+    with a single cumulative sum over the sorted redshifts.
 
     Arguments
     ---------
-    parameters : list of length 3
-        A list containing the cosmological parameters, with:
-        parameter[0] = H_0 (in units of km/s/Mpc)
-        parameter[1] = omega_lam_0
-        parameter[2] = omega_m_0
+    integrand : callable
+        A vectorized function of x = ln(1 + z).
+
+    z_val : array_like
+        Values for the redshift. Non-finite values give nan.
 
-    z_val : float
-        A value for the redshift.
+    tail : callable, optional
+        If not given, the integrals run from z = 0 to each z_val. If given, the integrals run from each z_val
+        to infinity, and tail(z) must return the integral from z to infinity, which is only called once, at the
+        largest finite redshift.
 
     Returns
     -------
-    d_M : float
-        The (Transverse) Comoving Distance (in Mpc) corresponding to the Cosmological parameters given, at the redshift z_val.
+    integral : ndarray
+        The integrals, with the same shape as z_val.
+
     """
-    h = parameters[0] / 100  # normalized Hubble's constant
-    omega_rad = 4.165e-5 / (h ** 2)
-    omega_k = 1 - sum(parameters[1:]) - omega_rad
-    if omega_k > 0:
-        d_M = HubbleDistance(parameters[0]) * (1 / np.sqrt(omega_k)) * np.sinh(np.sqrt(
-            omega_k) * comoving_distance_radial(parameters, z_val) / HubbleDistance(parameters[0]))
-    elif omega_k == 0:
-        d_M = comoving_distance_radial(parameters, z_val)
+    x = np.log1p(np.asarray(z_val, dtype=float))
+    finite = np.isfinite(x)
+    integral = np.full(x.shape, np.nan)
+    if not finite.any():
+        return(integral)
+    # searching for sorted values is much faster than for scattered ones, on large arrays
+    order = np.argsort(x[finite])
+    x_fin = x[finite][order]
+    x_min, x_max = min(x_fin[0], 0.0), max(x_fin[-1], 0.0)
+    edges = np.union1d(np.arange(x_min, x_max, _LN_STEP),
+                       np.append(x_fin, [0.0, x_max]))
+    seg = _segment_integrals(integrand, edges)
+    if tail is None:
+        cum = np.concatenate(([0.0], np.cumsum(seg)))
+        cum -= cum[np.searchsorted(edges, 0.0)]
     else:
-        d_M = HubbleDistance(parameters[0]) * (1 / np.sqrt(np.abs(omega_k))) * np.sin(np.sqrt(
-            np.abs(omega_k)) * comoving_distance_radial(parameters, z_val) / HubbleDistance(parameters[0]))
-    return(d_M)
+        cum = np.concatenate((np.cumsum(seg[::-1])[::-1], [0.0]))
+        cum += tail(np.expm1(x_max))
+    values = np.empty(len(x_fin))
+    values[order] = cum[np.searchsorted(edges, x_fin)]
+    integral[finite] = values
+    return(integral)
 
 
-def comoving_volume(parameters, z_val):
+def _drop_cancelled(value, scale, rtol=1e-10):
     """
-    A function to compute the comoving distance, given the cosmological parameters and a value
-    for redshift.
+    A helper function to replace by nan the values of a difference which lost more than rtol (relative) to
+    cancellation, given the magnitude of the terms that were subtracted.
 
     Arguments
     ---------
-    parameters : list of length 3
+    value : ndarray
+        The result of the difference.
+
+    scale : ndarray
+        The sum of the magnitudes of the terms of the difference.
+
+    rtol : float, optional
+        The largest relative error allowed. Defaults to 1e-10.
+
+    Returns
+    -------
+    value : ndarray
+        The difference, with nan wherever it is less precise than rtol.
+
+    """
+    return(np.where(16 * np.finfo(float).eps * scale <= rtol * np.abs(value), value, np.nan))
+
+
+class _LRUCache:
+    """
+    A small, thread-safe, least-recently-used cache with hit, miss and eviction counters.
+
+    Arguments
+    ---------
+    maxsize : int
+        The largest number of entries kept. A maxsize of 0 disables the cache.
+
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.hits = self.misses = self.evictions = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return the value stored under key (marking it as recently used), or None."""
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._data.move_to_end(key)
+            return(value)
+
+    def put(self, key, value):
+        """Store value under key, evicting the least recently used entries if the cache is full."""
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            self._evict()
+
+    def resize(self, maxsize):
+        """Change the largest number of entries kept, evicting entries if needed."""
+        with self._lock:
+            self.maxsize = maxsize
+            self._evict()
+
+    def clear(self):
+        """Drop every entry and reset the counters."""
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def info(self):
+        """Return the counters, the current size and the maximum size as a dict."""
+        with self._lock:
+            return({'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'size': len(self._data), 'maxsize': self.maxsize})
+
+    def _evict(self):
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+
+_COSMOLOGY_CACHE = _LRUCache(maxsize=128)  # Cosmology objects, keyed on (H_0, omega_lam_0, omega_m_0)
+_RESULT_CACHE = _LRUCache(maxsize=4096)  # per-redshift integrals, keyed on (H_0, omega_lam_0, omega_m_0, name, z)
+
+
+class Cosmology:
+    """
+    A class holding one set of cosmological parameters along with every quantity derived from them, so that
+    they are computed only once. Instances are usually obtained through get_cosmology(), which keeps them in
+    a process-wide LRU cache, and the integrals at single redshifts are kept in a second process-wide LRU
+    cache.
+
+    Arguments
+    ---------
+    H_0 : float
+        A value of the Hubble's constant (in km/s/Mpc).
+
+    omega_lam : float
+        The present day dark energy density.
+
+    omega_m : float
+        The present day matter density.
+
+    Attributes
+    ----------
+    paths : dict
+        The way each integral is evaluated, with the entries 'radial' (comoving distance) and 'age' (age
+        and lookback time), each one of:
+        'analytic' = elementary closed form, used when omega_lam_0 = 0
+        'elliptic' = Carlson symmetric elliptic integral, used for the comoving distance at single redshifts
+                     when omega_lam_0 != 0 (arrays are faster through the cumulative integral)
+        'quad' = numerical integration, used for everything else
+
+    """
+
+    def __init__(self, H_0, omega_lam, omega_m):
+        self.H_0 = H_0
+        self.omega_lam = omega_lam
+        self.omega_m = omega_m
+        self.key = (H_0, omega_lam, omega_m)
+        self.h = H_0 / 100  # normalized Hubble's constant
+        self.omega_rad = 4.165e-5 / (self.h ** 2)
+        self.omega_k = 1 - omega_lam - omega_m - self.omega_rad
+        self.H_s = convertH(H_0)  # H_0 in 1/s
+        self.d_H = HubbleDistance(H_0)  # Hubble distance in Mpc
+        self.t_H = 1 / self.H_s / (86400 * 365 * 1e9)  # Hubble time in Gyr
+        self.paths = self._choose_paths()
+
+    def __repr__(self):
+        return("Cosmology(H_0={!r}, omega_lam={!r}, omega_m={!r})".format(*self.key))
+
+    def inv_E(self, zp1):
+        """
+        Evaluate 1/E(z), with E(z) = H(z)/H_0.
+
+        Arguments
+        ---------
+        zp1 : float or ndarray
+            Value(s) of 1 + z.
+
+        Returns
+        -------
+        inv_E : float or ndarray
+            Value(s) of 1/E(z).
+
+        """
+        return(1 / np.sqrt(self.omega_lam + zp1 ** 2 * (self.omega_k + zp1 * (self.omega_m + self.omega_rad * zp1))))
+
+    def _choose_paths(self):
+        """
+        A helper method to decide which integrals have closed forms for these parameters (see paths).
+
+        With the radiation term included, E(z)^2 = omega_lam + a^2 (omega_k + omega_m a + omega_rad a^2), with
+        a = 1 + z. When omega_lam = 0 both integrals reduce to elementary functions of a, which are used as
+        long as omega_k is not so close to 0 that they lose precision. Otherwise, the comoving distance is an
+        elliptic integral of the first kind over the quartic E(z)^2, which is written in terms of Carlson's
+        R_F as long as every root of the quartic has a real part below 1 (this keeps the arguments of R_F off
+        its branch cut, and in particular excludes Universes without a Big Bang).
+        """
+        paths = {'radial': 'quad', 'age': 'quad'}
+        if self.omega_lam == 0 and abs(self.omega_k) > 1e-3:
+            return({'radial': 'analytic', 'age': 'analytic'})
+        roots = np.roots([self.omega_rad, self.omega_m, self.omega_k, 0.0, self.omega_lam])
+        roots = np.concatenate((roots, np.zeros(4 - len(roots))))  # np.roots drops the zero roots
+        if np.all(roots.real < 1 - 1e-6):
+            # put complex conjugates next to each other, so that X_1 X_2 and X_3 X_4 below stay real
+            roots = roots[np.lexsort((roots.imag, roots.real))]
+            self._Y = [cmath.sqrt(1.0 - r_i) for r_i in roots]
+            self._sqrt_omega_rad = np.sqrt(self.omega_rad)
+            paths['radial'] = 'elliptic'
+        return(paths)
+
+    def _analytic_radial(self, z):
+        """
+        A helper method for the closed form of the integral of da/(a sqrt(omega_rad a^2 + omega_m a + omega_k))
+        from 1 to a = 1 + z, i.e. the radial integral when omega_lam = 0. Values which lose more than 1e-10
+        (relative) to cancellation are returned as nan.
+        """
+        A, B, C = self.omega_rad, self.omega_m, self.omega_k
+
+        def F(x):
+            R = A * x ** 2 + B * x + C
+            if C > 0:
+                return(-np.log((2 * C + B * x + 2 * np.sqrt(C * R)) / x) / np.sqrt(C))
+            return(np.arcsin((B * x + 2 * C) / (x * np.sqrt(B ** 2 - 4 * A * C))) / np.sqrt(-C))
+        F_z, F_0 = F(1 + z), F(1.0)
+        return(_drop_cancelled(F_z - F_0, np.abs(F_z) + np.abs(F_0)))
+
+    def _analytic_age(self, z):
+        """
+        A helper method for the closed form of the integral of u du/sqrt(omega_k u^2 + omega_m u + omega_rad)
+        from 0 to u = 1/(1 + z), i.e. the age integral (in u = 1/a) when omega_lam = 0. Values which lose more
+        than 1e-10 (relative) to cancellation are returned as nan.
+        """
+        A, B, C = self.omega_rad, self.omega_m, self.omega_k
+
+        def G(u):
+            S = C * u ** 2 + B * u + A
+            if C > 0:
+                inner = np.log(2 * np.sqrt(C * S) + 2 * C * u + B) / np.sqrt(C)
+            else:
+                inner = -np.arcsin((2 * C * u + B) / np.sqrt(B ** 2 - 4 * A * C)) / np.sqrt(-C)
+            return(np.sqrt(S) / C, B / (2 * C) * inner)
+        (G1_z, G2_z), (G1_0, G2_0) = G(1 / (1 + z)), G(0.0)
+        return(_drop_cancelled((G1_z - G1_0) - (G2_z - G2_0), np.abs(G1_z) + np.abs(G2_z) + np.abs(G1_0) + np.abs(G2_0)))
+
+    def _elliptic_radial(self, z):
+        """
+        A helper method for the integral of da/sqrt(E^2) from 1 to a = 1 + z, with E^2 = omega_rad prod(a - r_i)
+        over the four roots r_i, using Carlson's formula (DLMF 19.29.8)
+        integral = 2 R_F(U_12^2, U_13^2, U_14^2) / sqrt(omega_rad).
+        """
+        Y = self._Y
+        if np.ndim(z) == 0:
+            # plain complex arithmetic is much faster than numpy for a single redshift
+            if z == 0:
+                return(0.0)
+            X = [cmath.sqrt(y_i * y_i + z) for y_i in Y]
+        else:
+            # z is added to 1 - r_i, rather than computing 1 + z first, so that small z keeps its precision
+            X = np.sqrt(np.asarray(Y) ** 2 + z[..., None])
+            X = [X[..., i] for i in range(4)]
+        U = [(X[0] * X[j] * Y[k] * Y[m] + Y[0] * Y[j] * X[k] * X[m]) / z
+             for j, k, m in ((1, 2, 3), (2, 1, 3), (3, 1, 2))]
+        integral = 2 * elliprf(U[0] ** 2, U[1] ** 2, U[2] ** 2).real / self._sqrt_omega_rad
+        # R_F gives the magnitude of the integral, which is negative for blueshifts
+        if np.ndim(z) == 0:
+            return(-integral if z < 0 else integral)
+        return(np.where(z == 0, 0.0, np.sign(z) * integral))
+
+    def _closed_form(self, closed, numeric, z_val):
+        """
+        A helper method evaluating closed(z) at the redshift(s) z_val, and numeric(z) wherever the closed
+        form gives nan.
+        """
+        if np.ndim(z_val) == 0:
+            with np.errstate(all='ignore'):
+                value = float(closed(float(z_val)))
+            return(numeric(float(z_val)) if value != value else value)
+        z = np.asarray(z_val, dtype=float)
+        with np.errstate(all='ignore'):
+            value = np.atleast_1d(closed(z)).astype(float)
+        bad = np.isnan(value)
+        if bad.any():
+            value[bad] = numeric(np.atleast_1d(z)[bad]) if z.ndim else numeric(float(z))
+        return(value.reshape(z.shape)[()])
+
+    def _cached(self, name, z_val, compute):
+        """
+        A helper method returning compute(z_val), looked up in (and stored to) the process-wide result cache.
+        """
+        key = self.key + (name, float(z_val))
+        value = _RESULT_CACHE.get(key)
+        if value is None:
+            value = compute(z_val)
+            _RESULT_CACHE.put(key, value)
+        return(value)
+
+    def _radial_numeric(self, z_val):
+        """
+        A helper method for the radial integral through numerical integration.
+        """
+        if np.ndim(z_val) > 0:
+            # in x = ln(1 + z), dz / E(z) = (1 + z) dx / E(z)
+            return(_cumulative_integral(_LnIntegrand(self, 1), z_val))
+        return(self._cached('radial', z_val, self._radial_scalar))
+
+    def _age_numeric(self, z_val):
+        """
+        A helper method for the age integral through numerical integration.
+        """
+        if np.ndim(z_val) > 0:
+            return(_cumulative_integral(_LnIntegrand(self, 0), z_val, tail=self._age_numeric))
+        return(self._cached('age', z_val, self._age_scalar))
+
+    def _radial_scalar(self, z):
+        """
+        A helper method for the radial integral at a single redshift, with the integrator of set_integrator().
+        The Gauss-Legendre rules integrate (1 + z)/E(z) over x = ln(1 + z), falling back to quad if they do
+        not converge.
+        """
+        accuracy = _INTEGRATOR['accuracy']
+        if _INTEGRATOR['method'] == 'gauss' and np.isfinite(z):
+            value = _gauss_integral(lambda x: np.exp(x) * self.inv_E(np.exp(x)), 0.0, np.log1p(z), accuracy)
+            if value is not None:
+                return(value)
+        return(quad(lambda z: self.inv_E(1 + z), 0, z, epsabs=0, epsrel=accuracy)[0])
+
+    def _age_scalar(self, z):
+        """
+        A helper method for the age integral at a single redshift, with the integrator of set_integrator().
+        With a = s^2 / (1 + z), the integral over [z, infinity) maps onto the integral of 2/(s E(z(s))) over
+        s in (0, 1], whose integrand vanishes like s^3 at s = 0, which the Gauss-Legendre rules integrate
+        (falling back to quad if they do not converge).
+        """
+        accuracy = _INTEGRATOR['accuracy']
+        if _INTEGRATOR['method'] == 'gauss' and np.isfinite(z):
+            value = _gauss_integral(lambda s: 2 / s * self.inv_E((1 + z) / s ** 2), 0.0, 1.0, accuracy)
+            if value is not None:
+                return(value)
+        return(quad(lambda z: self.inv_E(1 + z) / (1 + z), z, np.inf, epsabs=0, epsrel=accuracy)[0])
+
+    def radial_integral(self, z_val):
+        """
+        The integral of dz/E(z) from 0 to z_val, i.e. the (Radial) Comoving Distance in units of the Hubble
+        distance.
+        """
+        if self.paths['radial'] == 'analytic':
+            return(self._closed_form(self._analytic_radial, self._radial_numeric, z_val))
+        if self.paths['radial'] == 'elliptic' and np.ndim(z_val) == 0:
+            return(self._closed_form(self._elliptic_radial, self._radial_numeric, z_val))
+        return(self._radial_numeric(z_val))
+
+    def age_integral(self, z_val):
+        """
+        The integral of dz/((1 + z)E(z)) from z_val to infinity, i.e. the Age of the Universe at z_val in units
+        of the Hubble time.
+        """
+        if self.paths['age'] == 'analytic':
+            return(self._closed_form(self._analytic_age, self._age_numeric, z_val))
+        return(self._age_numeric(z_val))
+
+    def lookback_integral(self, z_val):
+        """
+        The integral of dz/((1 + z)E(z)) from 0 to z_val, i.e. the Light Travel Time from z_val in units of
+        the Hubble time.
+        """
+        if np.ndim(z_val) > 0 and self.paths['age'] == 'quad':
+            return(_cumulative_integral(_LnIntegrand(self, 0), z_val))
+        return(self.age_integral(0.0) - self.age_integral(z_val))
+
+    def t(self, z_val):
+        """The Age of the Universe (in Gyr) at the redshift(s) z_val."""
+        return(self.age_integral(z_val) * self.t_H)
+
+    def lightTravelTime(self, z_val):
+        """The Light Travel Time (in Gyr) from the redshift(s) z_val to z = 0."""
+        return(self.lookback_integral(z_val) * self.t_H)
+
+    def comoving_distance_radial(self, z_val):
+        """The (Radial) Comoving Distance (in Mpc) at the redshift(s) z_val."""
+        return(self.radial_integral(z_val) * self.d_H)
+
+    def comoving_distance_transverse(self, z_val):
+        """The (Transverse) Comoving Distance (in Mpc) at the redshift(s) z_val."""
+        return(_transverse_from_radial(self.comoving_distance_radial(z_val), self.H_0, self.omega_k))
+
+    def comoving_volume(self, z_val):
+        """The Comoving Volume (in cubic Gpc) at the redshift(s) z_val."""
+        return(_volume_from_transverse(self.comoving_distance_transverse(z_val), self.H_0, self.omega_k))
+
+    def angulardiameter_distance(self, z_val):
+        """The Angular Diameter Distance (in Mpc) at the redshift(s) z_val."""
+        return(self.comoving_distance_transverse(z_val) / (1 + np.asarray(z_val)))
+
+    def linear_scale(self, z_val):
+        """The linear scale (in kpc) corresponding to an angular scale of 1" at the redshift(s) z_val."""
+        return(self.angulardiameter_distance(z_val) * arcsec * 1000)
+
+    def luminosity_distance(self, z_val):
+        """The Luminosity Distance (in Mpc) at the redshift(s) z_val."""
+        return(self.comoving_distance_transverse(z_val) * (1 + np.asarray(z_val)))
+
+    def distance_modulus(self, z_val, out=None):
+        """The distance modulus (in mag) at the redshift(s) z_val, written to the array out if given."""
+        return(_distance_modulus(self.comoving_distance_transverse(z_val), z_val, out))
+
+    def absolute_magnitude(self, apparent_mag, z_val, out=None):
+        """The absolute magnitude of sources of apparent magnitude(s) apparent_mag at the redshift(s) z_val."""
+        return(_absolute_magnitude(self, apparent_mag, z_val, out))
+
+    def differential_comoving_volume(self, z_val):
+        """The differential Comoving Volume dV/dz/dOmega (in cubic Gpc per steradian) at the redshift(s) z_val."""
+        d_M = self.comoving_distance_transverse(z_val)
+        return(self.d_H * d_M ** 2 * self.inv_E(1 + np.asarray(z_val)) / 1e9)
+
+    def comoving_volume_shells(self, z_edges, area=None):
+        """
+        Compute the comoving volume between consecutive redshift bin edges, over a given sky area. The
+        transverse comoving distances at all the edges come from one cumulative integral over the sorted
+        edges, and the shell volumes are the differences of the enclosed volumes.
+
+        Arguments
+        ---------
+        z_edges : array_like
+            The increasing redshift bin edges.
+
+        area : float, optional
+            The sky area (in square degrees). Defaults to the full sky.
+
+        Returns
+        -------
+        V_shells : ndarray
+            The Comoving Volume (in cubic Gpc) of each of the len(z_edges) - 1 shells.
+
+        """
+        z_edges = np.asarray(z_edges, dtype=float)
+        if z_edges.ndim != 1 or len(z_edges) < 2 or not np.all(np.diff(z_edges) > 0):
+            raise ValueError("z_edges must be an increasing 1-d array of at least 2 redshifts.")
+        d_M = _transverse_from_radial(self.radial_integral(z_edges) * self.d_H, self.H_0, self.omega_k)
+        V_c = _volume_from_transverse(d_M, self.H_0, self.omega_k)
+        fraction = 1.0 if area is None else area / FULL_SKY
+        return(np.diff(V_c) * fraction)
+
+    def ode_integrals(self, z_val, rtol=1e-10):
+        """
+        Compute the radial, lookback and age integrals (in units of the Hubble distance and time) at every
+        redshift in z_val with a single adaptive ODE integration along the sorted redshifts, reading the
+        values off the dense output of the solver.
+
+        In x = ln(1 + z), the system dD/dx = (1 + z)/E, dL/dx = 1/E is integrated from x = 0, where
+        D = L = 0, up to the largest redshift. The age follows from the lookback integral as
+        A(x) = A(x_max) + L(x_max) - L(x), with A(x_max) the age integral at the largest redshift : integrating
+        the age itself forward is unstable, and A(0) - L(x) would lose the relative accuracy of the tiny ages
+        at high redshift. Redshifts below 0 are reached with a second sweep towards negative x. The radial and
+        lookback integrals agree with the quadratures to about rtol, the age to about rtol in units of the Hubble
+        time (so to about 1e-6 relative at z ~ 1000 with the default rtol).
+
+        Arguments
+        ---------
+        z_val : float or array_like
+            A value, or an array of values, for the redshift. Non-finite values give nan.
+
+        rtol : float, optional
+            The relative tolerance of the ODE solver. Defaults to 1e-10.
+
+        Returns
+        -------
+        radial, lookback, age : float or ndarray
+            The three integrals, with the same shape as z_val.
+
+        """
+        x = np.log1p(np.asarray(z_val, dtype=float))
+        finite = np.isfinite(x)
+        out = np.full((3,) + x.shape, np.nan)
+        x_fin = np.unique(x[finite])
+        values = np.zeros((3, len(x_fin)))
+
+        def rhs(x, y):
+            inv_E = self.inv_E(np.exp(x))
+            return([np.exp(x) * inv_E, inv_E])
+
+        for sweep, order in ((x_fin > 0, slice(None)), (x_fin < 0, slice(None, None, -1))):
+            x_sweep = x_fin[sweep][order]  # in the direction of integration, away from x = 0
+            if len(x_sweep) == 0:
+                continue
+            sol = solve_ivp(rhs, (0.0, x_sweep[-1]), [0.0, 0.0], method='DOP853', t_eval=x_sweep,
+                            rtol=rtol, atol=1e-30)
+            values[:2, sweep] = sol.y[:, order] if sol.success else np.nan
+        values[2] = self.age_integral(0.0) - values[1]
+        if x_fin.size and x_fin[-1] > 0:
+            high = x_fin > 0
+            values[2, high] = (self.age_integral(np.expm1(x_fin[-1])) + values[1, -1]) - values[1, high]
+        out[:, finite] = values[:, np.searchsorted(x_fin, x[finite])]
+        return(out[0][()], out[1][()], out[2][()])
+
+    def compute_all(self, z_val, method='integral', dtype=None):
+        """
+        Compute every output of the calculator at the redshift(s) z_val, sharing one radial integral and one
+        age integral between all of them, or (with method='ode') one ODE integration for all three integrals,
+        or (with method='table') lookups in the table of get_table(). The array outputs are cast to dtype if
+        given. See compute_all() for the keys of the returned dict.
+        """
+        if dtype is not None:
+            z_val = np.asarray(z_val, dtype=dtype)[()]
+        zp1 = 1 + np.asarray(z_val)
+        if method == 'table':
+            table = get_table(list(self.key), dtype)
+            age_0 = float(table.t(0.0))
+            d_c, ltt, age = table.comoving_distance_radial(z_val), table.lightTravelTime(z_val), table.t(z_val)
+        else:
+            age_0 = self.t(0.0)
+        if method == 'ode':
+            radial, lookback, age = self.ode_integrals(z_val)
+            d_c, ltt, age = radial * self.d_H, lookback * self.t_H, age * self.t_H
+        elif method == 'integral':
+            d_c = self.comoving_distance_radial(z_val)
+            age = self.t(z_val)
+            if np.ndim(z_val) > 0:
+                ltt = self.lightTravelTime(z_val)
+            else:
+                ltt = age_0 - age
+        elif method != 'table':
+            raise ValueError("Unknown method {!r}, choose from 'integral', 'ode' or 'table'.".format(method))
+        if dtype is not None:
+            d_c, ltt, age = (np.asarray(v, dtype=dtype)[()] for v in (d_c, ltt, age))
+        d_M = _transverse_from_radial(d_c, self.H_0, self.omega_k)
+        return({'age_0': age_0,
+                'age': age,
+                'light_travel_time': ltt,
+                'comoving_distance_radial': d_c,
+                'comoving_distance_transverse': d_M,
+                'comoving_volume': _volume_from_transverse(d_M, self.H_0, self.omega_k),
+                'angulardiameter_distance': d_M / zp1,
+                'linear_scale': d_M / zp1 * arcsec * 1000,
+                'luminosity_distance': d_M * zp1,
+                'paths': dict(self.paths)})
+
+
+class CosmologyW0Wa(Cosmology):
+    """
+    A Cosmology whose dark energy has the equation of state w(z) = w_0 + w_a z/(1 + z) (the CPL
+    parameterization, wCDM being w_a = 0) instead of a cosmological constant, so that omega_lam_0 is scaled
+    by (1 + z)^(3 (1 + w_0 + w_a)) exp(-3 w_a z/(1 + z)) in E(z)^2. There are no closed forms for these
+    models, so the integrals are always evaluated numerically, and every other method is inherited.
+
+    Arguments
+    ---------
+    H_0 : float
+        A value of the Hubble's constant (in km/s/Mpc).
+
+    omega_lam : float
+        The present day dark energy density.
+
+    omega_m : float
+        The present day matter density.
+
+    w_0, w_a : float
+        The parameters of the dark energy equation of state.
+
+    """
+
+    def __init__(self, H_0, omega_lam, omega_m, w_0, w_a=0.0):
+        self.w_0 = w_0
+        self.w_a = w_a
+        super().__init__(H_0, omega_lam, omega_m)
+        self.key = (H_0, omega_lam, omega_m, w_0, w_a)
+
+    def __repr__(self):
+        return("CosmologyW0Wa(H_0={!r}, omega_lam={!r}, omega_m={!r}, w_0={!r}, w_a={!r})".format(*self.key))
+
+    def inv_E(self, zp1):
+        """
+        Evaluate 1/E(z), with E(z) = H(z)/H_0.
+
+        Arguments
+        ---------
+        zp1 : float or ndarray
+            Value(s) of 1 + z.
+
+        Returns
+        -------
+        inv_E : float or ndarray
+            Value(s) of 1/E(z).
+
+        """
+        omega_de = self.omega_lam * zp1 ** (3 * (1 + self.w_0 + self.w_a)) * np.exp(3 * self.w_a * (1 / zp1 - 1))
+        return(1 / np.sqrt(omega_de + zp1 ** 2 * (self.omega_k + zp1 * (self.omega_m + self.omega_rad * zp1))))
+
+    def _choose_paths(self):
+        return({'radial': 'quad', 'age': 'quad'})
+
+
+def get_cosmology(parameters):
+    """
+    A function to get the Cosmology object for a set of cosmological parameters, from the process-wide LRU
+    cache if it has been built before.
+
+    Arguments
+    ---------
+    parameters : list of length 3, 4 or 5
         A list containing the cosmological parameters, with:
         parameter[0] = H_0 (in units of km/s/Mpc)
-        parameter[1] = omega_lam_0
+        parameter[1] = omega_lam_0 (the dark energy density)
         parameter[2] = omega_m_0
-
-    z_val : float
-        A value for the redshift.
+        parameter[3] = w_0 (optional, defaults to -1)
+        parameter[4] = w_a (optional, defaults to 0)
+        Every function of this module taking parameters accepts the two optional entries as well.
 
     Returns
     -------
-    V_c : float
-        The Comoving Volume (in cubic Gpc) corresponding to the Cosmological parameters given, at the redshift z_val.
+    cosmo : Cosmology
+        The Cosmology object for the given parameters, a CosmologyW0Wa unless w_0 = -1 and w_a = 0.
 
     """
-    d_M = comoving_distance_transverse(parameters, z_val)
-    h = parameters[0] / 100  # normalized Hubble's constant
-    omega_rad = 4.165e-5 / (h ** 2)
-    omega_k = 1 - sum(parameters[1:]) - omega_rad
-    if omega_k > 0:
-        V_c = (4 * pi * HubbleDistance(parameters[0]) ** 3) / (2 * omega_k) * ((d_M / HubbleDistance(parameters[0])) * np.sqrt(1 + omega_k * np.power(
-            d_M / HubbleDistance(parameters[0]), 2)) - 1 / np.sqrt(np.abs(omega_k)) * np.arcsinh(np.sqrt(np.abs(omega_k)) * d_M / HubbleDistance(parameters[0])))
-        V_c = V_c / 1e9
-    elif omega_k == 0:
-        V_c = (4 * pi / 3) * (d_M ** 3) / 1e9
-    else:
-        V_c = (4 * pi * HubbleDistance(parameters[0]) ** 3) / (2 * omega_k) * ((d_M / HubbleDistance(parameters[0])) * np.sqrt(1 + omega_k * np.power(
-            d_M / HubbleDistance(parameters[0]), 2)) - 1 / np.sqrt(np.abs(omega_k)) * np.arcsin(np.sqrt(np.abs(omega_k)) * d_M / HubbleDistance(parameters[0])))
-        V_c = V_c / 1e9
-    return(V_c)
+    # round H_0 so that values converted back from 1/s (see t()) share the same key
+    key = (float('{:.12g}'.format(parameters[0])), float(parameters[1]), float(parameters[2]))
+    w = (float(parameters[3]), float(parameters[4]) if len(parameters) > 4 else 0.0) if len(parameters) > 3 else ()
+    if w and w != (-1.0, 0.0):
+        key = key + w
+    cosmo = _COSMOLOGY_CACHE.get(key)
+    if cosmo is None:
+        cosmo = Cosmology(*key) if len(key) == 3 else CosmologyW0Wa(*key)
+        _COSMOLOGY_CACHE.put(key, cosmo)
+    return(cosmo)
 
 
-def angulardiameter_distance(parameters, z_val):
+def integration_paths(parameters):
     """
-    Function to compute the angular diameter distance, corresponding to a cosmology set by parameters,
-    at the redshift z_val.
+    A function to report how the integrals are evaluated for a set of cosmological parameters : through a
+    closed form when one exists, or through numerical integration otherwise.
 
     Arguments
     ---------
@@ -229,72 +949,1898 @@ def angulardiameter_distance(parameters, z_val):
         parameter[1] = omega_lam_0
         parameter[2] = omega_m_0
 
-    z_val : float
-        A value for the redshift.
+    Returns
+    -------
+    paths : dict
+        A dict with the entries 'radial' (comoving distances and volume) and 'age' (age and light travel
+        time), each one of 'analytic', 'elliptic' or 'quad'. See Cosmology for when each one is used.
+
+    """
+    paths = dict(get_cosmology(parameters).paths)
+    return(paths)
+
+
+def set_integrator(method=None, accuracy=None):
+    """
+    A function to choose how the integrals without a closed form are evaluated at single redshifts (arrays of
+    redshifts always use the cumulative integral). Changing it empties the result cache, whose entries were
+    computed with the previous integrator.
+
+    Arguments
+    ---------
+    method : str, optional
+        'quad' (the default) for the adaptive scipy.integrate.quad, or 'gauss' for vectorized Gauss-Legendre
+        rules of increasing order, which need far fewer Python calls for the smooth 1/E(z) integrand.
+
+    accuracy : float, optional
+        The relative tolerance of either integrator. Defaults to 1.49e-8, the default of quad.
 
     Returns
     -------
-    d_a : float
-        The Angular Diameter Distance (in Mpc) corresponding to the Cosmological parameters given, at the redshift z_val.
+    integrator : dict
+        The integrator in use, with the entries 'method' and 'accuracy'.
 
     """
-    d_M = comoving_distance_transverse(parameters, z_val)
-    d_a = d_M / (1 + z_val)
-    return(d_a)
+    if method not in (None, 'quad', 'gauss'):
+        raise ValueError("Unknown integrator {!r}, choose from 'quad' or 'gauss'.".format(method))
+    if accuracy is not None and not accuracy > 0:
+        raise ValueError("accuracy must be positive, got {!r}.".format(accuracy))
+    update = {key: value for key, value in (('method', method), ('accuracy', accuracy)) if value is not None}
+    if update:
+        _INTEGRATOR.update(update)
+        _RESULT_CACHE.clear()
+    return(dict(_INTEGRATOR))
 
 
-def linear_scale(parameters, z_val):
+def cache_info():
     """
-    A function to compute the linear scale, corresponding to an angular size of 1",
-    at an angular diameter distance set by the parameters and at the redshift values
-    z = z_val.
+    A function to report the state of the process-wide caches.
+
+    Returns
+    -------
+    info : dict
+        A dict with the entries 'cosmologies', 'results' and 'tables', each a dict of the hits, misses,
+        evictions, current size and maximum size of the corresponding cache.
+
+    """
+    return({'cosmologies': _COSMOLOGY_CACHE.info(), 'results': _RESULT_CACHE.info(),
+            'tables': _TABLE_CACHE.info()})
+
+
+def set_cache_size(cosmologies=None, results=None, tables=None):
+    """
+    A function to change the maximum sizes of the process-wide caches. A size of 0 disables a cache.
+
+    Arguments
+    ---------
+    cosmologies : int, optional
+        The largest number of Cosmology objects kept.
+
+    results : int, optional
+        The largest number of per-redshift results kept.
+
+    tables : int, optional
+        The largest number of CosmologyTable objects kept (see get_table()).
+
+    """
+    if cosmologies is not None:
+        _COSMOLOGY_CACHE.resize(cosmologies)
+    if results is not None:
+        _RESULT_CACHE.resize(results)
+    if tables is not None:
+        _TABLE_CACHE.resize(tables)
+
+
+def clear_cache():
+    """
+    A function to empty the process-wide caches and reset their counters.
+    """
+    _COSMOLOGY_CACHE.clear()
+    _RESULT_CACHE.clear()
+    _TABLE_CACHE.clear()
+
+
+def t(parameters, z_val):
+    """
+    A function to calculate age of Universe at the given redshift of z_val.
 
     Arguments
     ---------
     parameters : list of length 3
         A list containing the cosmological parameters, with:
-        parameter[0] = H_0 (in units of km/s/Mpc)
+        parameter[0] = H_0 (in units of 1/s)
         parameter[1] = omega_lam_0
         parameter[2] = omega_m_0
 
-    z_val : float
-        A value for the redshift.
+    z_val : float or array_like
+        A value, or an array of values, for the redshift.
 
     Returns
     -------
-    scale : float
-        The linear scale (in kpc) corresponding to an angular scale of 1", at a distance equal
-        to the Angular Diameter Distance for the Cosmological parameters given,
-        at the redshift z_val.
+    t_age : float or ndarray
+        A value for the Age of the Universe (in Gyr) at redshift z = z_val.
 
     """
-    scale = angulardiameter_distance(
-        parameters, z_val) * arcsec * 1000  # convert from Mpc to kpc
-    return(scale)
+    # parameters[0] is in 1/s here, convert it back to km/s/Mpc
+    cosmo = get_cosmology([parameters[0] * (3.086e22) / 1000] + list(parameters[1:]))
+    t_age = cosmo.t(z_val)
+    return(t_age)
 
 
-def luminosity_distance(parameters, z_val):
+def lightTravelTime(parameters, z_val):
     """
-    Function to compute the luminosity distance, corresponding to a cosmology set by parameters,
-    at the redshift z_val.
+    A function to calculate the Light Travel Time from redshift z = z_val to z = 0.
 
     Arguments
     ---------
     parameters : list of length 3
         A list containing the cosmological parameters, with:
-        parameter[0] = H_0 (in units of km/s/Mpc)
+        parameter[0] = H_0 (in units of 1/s)
         parameter[1] = omega_lam_0
         parameter[2] = omega_m_0
 
-    z_val : float
-        A value for the redshift.
+    z_val : float or array_like
+        A value, or an array of values, for the redshift.
 
     Returns
     -------
-    d_l : float
-        The Luminosity Distance (in Mpc) corresponding to the Cosmological parameters given, at the redshift z_val.
-
+    ltt : float or ndarray
+        The Light Travel Time (in Gyr) corresponding to the Cosmological parameters given, from the redshift z = z_val
+        to z = 0.
+
+    """
+    cosmo = get_cosmology([parameters[0] * (3.086e22) / 1000] + list(parameters[1:]))
+    ltt = cosmo.lightTravelTime(z_val)
+    return(ltt)
+
+
+def comoving_distance_radial(parameters, z_val):
+    """
+    A function to compute the (radial) comoving distance, given the cosmological parameters and a value
+    for redshift.
+
+    Arguments
+    ---------
+    parameters : list of length 3
+        A list containing the cosmological parameters, with:
+        parameter[0] = H_0 (in units of km/s/Mpc)
+        parameter[1] = omega_lam_0
+        parameter[2] = omega_m_0
+
+    z_val : float or array_like
+        A value, or an array of values, for the redshift.
+
+    Returns
+    -------
+    d_c : float or ndarray
+        The (Radial) Comoving Distance (in Mpc) corresponding to the Cosmological parameters given, at the redshift z_val.
+
+    """
+    d_c = get_cosmology(parameters).comoving_distance_radial(z_val)
+    return(d_c)
+
+
+def _transverse_from_radial(d_c, H_0, omega_k):
+    """
+    A helper function to convert a (radial) comoving distance into a (transverse) comoving distance.
+
+    Arguments
+    ---------
+    d_c : float or ndarray
+        The (Radial) Comoving Distance (in Mpc).
+
+    H_0 : float
+        A value of the Hubble's constant (in km/s/Mpc).
+
+    omega_k : float
+        The present day curvature density.
+
+    Returns
+    -------
+    d_M : float or ndarray
+        The (Transverse) Comoving Distance (in Mpc).
+
+    """
+    # Python floats, so that float32 distances (see CosmologyTable.astype) are not promoted
+    d_H, root = float(HubbleDistance(H_0)), float(np.sqrt(np.abs(omega_k)))
+    if omega_k > 0:
+        d_M = d_H * (1 / root) * np.sinh(root * d_c / d_H)
+    elif omega_k == 0:
+        d_M = d_c
+    else:
+        d_M = d_H * (1 / root) * np.sin(root * d_c / d_H)
+    return(d_M)
+
+
+def _volume_from_transverse(d_M, H_0, omega_k):
+    """
+    A helper function to convert a (transverse) comoving distance into the comoving volume enclosed by it.
+
+    Arguments
+    ---------
+    d_M : float or ndarray
+        The (Transverse) Comoving Distance (in Mpc).
+
+    H_0 : float
+        A value of the Hubble's constant (in km/s/Mpc).
+
+    omega_k : float
+        The present day curvature density.
+
+    Returns
+    -------
+    V_c : float or ndarray
+        The Comoving Volume (in cubic Gpc).
+
+    """
+    # the closed forms cancel too much in single precision, so reduced precision distances (see
+    # CosmologyTable.astype) are converted in double precision and the volume cast back to their type
+    dtype = np.result_type(d_M)
+    if dtype.kind == 'f' and dtype.itemsize < 8:
+        return(_volume_from_transverse(np.asarray(d_M, dtype=float), H_0, omega_k).astype(dtype)[()])
+    d_H = HubbleDistance(H_0)
+    if omega_k > 0:
+        V_c = (4 * pi * d_H ** 3) / (2 * omega_k) * ((d_M / d_H) * np.sqrt(1 + omega_k * np.power(
+            d_M / d_H, 2)) - 1 / np.sqrt(np.abs(omega_k)) * np.arcsinh(np.sqrt(np.abs(omega_k)) * d_M / d_H))
+        V_c = V_c / 1e9
+    elif omega_k == 0:
+        V_c = (4 * pi / 3) * (d_M ** 3) / 1e9
+    else:
+        V_c = (4 * pi * d_H ** 3) / (2 * omega_k) * ((d_M / d_H) * np.sqrt(1 + omega_k * np.power(
+            d_M / d_H, 2)) - 1 / np.sqrt(np.abs(omega_k)) * np.arcsin(np.sqrt(np.abs(omega_k)) * d_M / d_H))
+        V_c = V_c / 1e9
+    # the expressions above cancel catastrophically for small curvature or distances, use their series there
+    u = omega_k * np.power(d_M / d_H, 2)
+    V_c = np.where(np.abs(u) < 1e-3, (4 * pi / 3) * (d_M ** 3) * (1 - 0.3 * u + 9 * u ** 2 / 56) / 1e9, V_c)[()]
+    return(V_c)
+
+
+def _distance_modulus(d_M, z_val, out=None):
+    """
+    A helper function to convert a (transverse) comoving distance into the distance modulus, in place in
+    the output buffer, so that no temporary array is allocated.
+
+    Arguments
+    ---------
+    d_M : float or ndarray
+        The (Transverse) Comoving Distance (in Mpc).
+
+    z_val : float or array_like
+        The redshift(s) at which d_M was computed.
+
+    out : ndarray, optional
+        The array the result is written to, with the broadcast shape of d_M and z_val. Defaults to a new
+        array of their type (or a float for a single redshift).
+
+    Returns
+    -------
+    mu : float or ndarray
+        The distance modulus (in mag), out if it was given.
+
+    """
+    z_val = np.asarray(z_val)
+    if out is None:
+        out = np.empty(np.broadcast(d_M, z_val).shape, dtype=np.result_type(d_M, z_val))
+    # mu = 5 log10(d_L / 10 pc), with d_L = d_M (1 + z) in Mpc
+    np.add(z_val, 1, out=out)
+    np.multiply(out, d_M, out=out)
+    with np.errstate(divide='ignore'):
+        np.log10(out, out=out)
+    out *= 5
+    out += 25
+    return(out[()] if out.ndim == 0 else out)
+
+
+def _absolute_magnitude(source, apparent_mag, z_val, out=None):
+    """
+    A helper function to convert apparent magnitudes into absolute magnitudes, M = m - mu(z), reusing the
+    output buffer for the distance modulus whenever it has the shape of z_val and is not apparent_mag itself.
+
+    Arguments
+    ---------
+    source : Cosmology or CosmologyTable
+        The object computing the distance modulus.
+
+    apparent_mag : float or array_like
+        The apparent magnitude(s), broadcast against z_val.
+
+    z_val : float or array_like
+        The redshift(s).
+
+    out : ndarray, optional
+        The array the result is written to, with the broadcast shape of apparent_mag and z_val. Defaults to a
+        new array (or a float for a single value).
+
+    Returns
+    -------
+    M : float or ndarray
+        The absolute magnitude(s), out if it was given.
+
+    """
+    apparent_mag, z_val = np.asarray(apparent_mag), np.asarray(z_val)
+    if out is None:
+        out = np.empty(np.broadcast(apparent_mag, z_val).shape,
+                       dtype=np.promote_types(np.result_type(apparent_mag, z_val), np.float32))
+    if out.shape == np.shape(z_val) and not np.shares_memory(out, apparent_mag):
+        source.distance_modulus(z_val, out=out)
+        np.subtract(apparent_mag, out, out=out)
+    else:
+        np.subtract(apparent_mag, source.distance_modulus(z_val), out=out)
+    return(out[()] if out.ndim == 0 else out)
+
+
+def comoving_distance_transverse(parameters, z_val):
+    """
+    A function to compute the (transverse) comoving distance, given the cosmological parameters and a value
+    for redshift.
+
+    Arguments
+    ---------
+    parameters : list of length 3
+        A list containing the cosmological parameters, with:
+        parameter[0] = H_0 (in units of km/s/Mpc)
+        parameter[1] = omega_lam_0
+        parameter[2] = omega_m_0
+
+    z_val : float or array_like
+        A value, or an array of values, for the redshift.
+
+    Returns
+    -------
+    d_M : float or ndarray
+        The (Transverse) Comoving Distance (in Mpc) corresponding to the Cosmological parameters given, at the redshift z_val.
+    """
+    d_M = get_cosmology(parameters).comoving_distance_transverse(z_val)
+    return(d_M)
+
+
+def comoving_volume(parameters, z_val):
+    """
+    A function to compute the comoving distance, given the cosmological parameters and a value
+    for redshift.
+
+    Arguments
+    ---------
+    parameters : list of length 3
+        A list containing the cosmological parameters, with:
+        parameter[0] = H_0 (in units of km/s/Mpc)
+        parameter[1] = omega_lam_0
+        parameter[2] = omega_m_0
+
+    z_val : float or array_like
+        A value, or an array of values, for the redshift.
+
+    Returns
+    -------
+    V_c : float or ndarray
+        The Comoving Volume (in cubic Gpc) corresponding to the Cosmological parameters given, at the redshift z_val.
+
+    """
+    V_c = get_cosmology(parameters).comoving_volume(z_val)
+    return(V_c)
+
+
+def angulardiameter_distance(parameters, z_val):
+    """
+    Function to compute the angular diameter distance, corresponding to a cosmology set by parameters,
+    at the redshift z_val.
+
+    Arguments
+    ---------
+    parameters : list of length 3
+        A list containing the cosmological parameters, with:
+        parameter[0] = H_0 (in units of km/s/Mpc)
+        parameter[1] = omega_lam_0
+        parameter[2] = omega_m_0
+
+    z_val : float or array_like
+        A value, or an array of values, for the redshift.
+
+    Returns
+    -------
+    d_a : float or ndarray
+        The Angular Diameter Distance (in Mpc) corresponding to the Cosmological parameters given, at the redshift z_val.
+
+    """
+    d_a = get_cosmology(parameters).angulardiameter_distance(z_val)
+    return(d_a)
+
+
+def linear_scale(parameters, z_val):
+    """
+    A function to compute the linear scale, corresponding to an angular size of 1",
+    at an angular diameter distance set by the parameters and at the redshift values
+    z = z_val.
+
+    Arguments
+    ---------
+    parameters : list of length 3
+        A list containing the cosmological parameters, with:
+        parameter[0] = H_0 (in units of km/s/Mpc)
+        parameter[1] = omega_lam_0
+        parameter[2] = omega_m_0
+
+    z_val : float or array_like
+        A value, or an array of values, for the redshift.
+
+    Returns
+    -------
+    scale : float or ndarray
+        The linear scale (in kpc) corresponding to an angular scale of 1", at a distance equal
+        to the Angular Diameter Distance for the Cosmological parameters given,
+        at the redshift z_val.
+
+    """
+    scale = get_cosmology(parameters).linear_scale(z_val)
+    return(scale)
+
+
+def luminosity_distance(parameters, z_val):
+    """
+    Function to compute the luminosity distance, corresponding to a cosmology set by parameters,
+    at the redshift z_val.
+
+    Arguments
+    ---------
+    parameters : list of length 3
+        A list containing the cosmological parameters, with:
+        parameter[0] = H_0 (in units of km/s/Mpc)
+        parameter[1] = omega_lam_0
+        parameter[2] = omega_m_0
+
+    z_val : float or array_like
+        A value, or an array of values, for the redshift.
+
+    Returns
+    -------
+    d_l : float or ndarray
+        The Luminosity Distance (in Mpc) corresponding to the Cosmological parameters given, at the redshift z_val.
+
     """
-    d_M = comoving_distance_transverse(parameters, z_val)
-    d_l = (1 + z_val) * d_M
+    d_l = get_cosmology(parameters).luminosity_distance(z_val)
     return(d_l)
+
+
+def distance_modulus(parameters, z_val, out=None):
+    """
+    A function to compute the distance modulus mu = 5 log10(d_L / 10 pc), corresponding to a cosmology set
+    by parameters, at the redshift z_val.
+
+    Arguments
+    ---------
+    parameters : list of length 3
+        A list containing the cosmological parameters, with:
+        parameter[0] = H_0 (in units of km/s/Mpc)
+        parameter[1] = omega_lam_0
+        parameter[2] = omega_m_0
+
+    z_val : float or array_like
+        A value, or an array of values, for the redshift.
+
+    out : ndarray, optional
+        An array of the shape of z_val the result is written to, instead of a new array. The luminosity
+        distance is computed in this buffer, so streaming jobs allocate no temporary per stage.
+
+    Returns
+    -------
+    mu : float or ndarray
+        The distance modulus (in mag) corresponding to the Cosmological parameters given, at the redshift
+        z_val (out, if it was given).
+
+    """
+    mu = get_cosmology(parameters).distance_modulus(z_val, out)
+    return(mu)
+
+
+def absolute_magnitude(parameters, apparent_mag, z_val, out=None):
+    """
+    A function to compute the absolute magnitude M = m - mu of sources of apparent magnitude m at the
+    redshift z_val, given the cosmological parameters. No K-correction is applied.
+
+    Arguments
+    ---------
+    parameters : list of length 3
+        A list containing the cosmological parameters, with:
+        parameter[0] = H_0 (in units of km/s/Mpc)
+        parameter[1] = omega_lam_0
+        parameter[2] = omega_m_0
+
+    apparent_mag : float or array_like
+        The apparent magnitude(s), broadcast against z_val (e.g. of shape (n, n_bands) for z_val of shape
+        (n, 1)).
+
+    z_val : float or array_like
+        A value, or an array of values, for the redshift.
+
+    out : ndarray, optional
+        An array of the broadcast shape of apparent_mag and z_val the result is written to, instead of a new
+        array. It may be apparent_mag itself.
+
+    Returns
+    -------
+    M : float or ndarray
+        The absolute magnitude(s) corresponding to the Cosmological parameters given (out, if it was given).
+
+    """
+    M = get_cosmology(parameters).absolute_magnitude(apparent_mag, z_val, out)
+    return(M)
+
+
+def differential_comoving_volume(parameters, z_val):
+    """
+    A function to compute the differential comoving volume dV/dz/dOmega, i.e. the comoving volume per unit
+    redshift and per unit solid angle, given the cosmological parameters and a value for redshift.
+
+    Arguments
+    ---------
+    parameters : list of length 3
+        A list containing the cosmological parameters, with:
+        parameter[0] = H_0 (in units of km/s/Mpc)
+        parameter[1] = omega_lam_0
+        parameter[2] = omega_m_0
+
+    z_val : float or array_like
+        A value, or an array of values, for the redshift.
+
+    Returns
+    -------
+    dV : float or ndarray
+        The differential Comoving Volume (in cubic Gpc per steradian) corresponding to the Cosmological
+        parameters given, at the redshift z_val.
+
+    """
+    dV = get_cosmology(parameters).differential_comoving_volume(z_val)
+    return(dV)
+
+
+def comoving_volume_shells(parameters, z_edges, area=None):
+    """
+    A function to compute the comoving volume of every redshift bin of a survey, given the cosmological
+    parameters, the bin edges and the sky area, in one vectorized pass over the edges.
+
+    Arguments
+    ---------
+    parameters : list of length 3
+        A list containing the cosmological parameters, with:
+        parameter[0] = H_0 (in units of km/s/Mpc)
+        parameter[1] = omega_lam_0
+        parameter[2] = omega_m_0
+
+    z_edges : array_like
+        The increasing redshift bin edges.
+
+    area : float, optional
+        The sky area (in square degrees) of the survey. Defaults to the full sky, FULL_SKY.
+
+    Returns
+    -------
+    V_shells : ndarray
+        The Comoving Volume (in cubic Gpc) between each pair of consecutive edges, within the sky area.
+
+    """
+    V_shells = get_cosmology(parameters).comoving_volume_shells(z_edges, area)
+    return(V_shells)
+
+
+def compute_all(parameters, z_val, method='integral', dtype=None):
+    """
+    A function to compute every output of the calculator at once, given the cosmological parameters and a
+    value for redshift. The radial comoving distance and age integrals are evaluated only once and shared
+    between all the outputs.
+
+    Arguments
+    ---------
+    parameters : list of length 3
+        A list containing the cosmological parameters, with:
+        parameter[0] = H_0 (in units of km/s/Mpc)
+        parameter[1] = omega_lam_0
+        parameter[2] = omega_m_0
+
+    z_val : float or array_like
+        A value, or an array of values, for the redshift.
+
+    method : str, optional
+        'integral' (the default) evaluates the integrals as the functions above do, 'ode' evaluates all of
+        them at once with a single ODE integration along the sorted redshifts (see Cosmology.ode_integrals),
+        'table' looks them up in the table of get_table(), which is precomputed for the PRESETS.
+
+    dtype : dtype, optional
+        The floating point type of the array outputs, e.g. numpy.float32 to halve their memory. With
+        method='table' the lookups themselves are done in that type (see CosmologyTable.astype()), to a
+        relative error below 1e-5 for float32. Defaults to float64.
+
+    Returns
+    -------
+    outputs : dict
+        A dict with the entries:
+        'age_0' = Age of the Universe (in Gyr) at z = 0
+        'age' = Age of the Universe (in Gyr) at z_val
+        'light_travel_time' = Light Travel Time (in Gyr) from z_val
+        'comoving_distance_radial' = (Radial) Comoving Distance (in Mpc)
+        'comoving_distance_transverse' = (Transverse) Comoving Distance (in Mpc)
+        'comoving_volume' = Comoving Volume (in cubic Gpc)
+        'angulardiameter_distance' = Angular Diameter Distance (in Mpc)
+        'linear_scale' = linear scale (in kpc) corresponding to 1"
+        'luminosity_distance' = Luminosity Distance (in Mpc)
+        'paths' = the way the integrals were evaluated, see integration_paths()
+
+    """
+    outputs = get_cosmology(parameters).compute_all(z_val, method, dtype)
+    return(outputs)
+
+
+class CosmologyTable:
+    """
+    A class holding precomputed tables of the comoving distance, lookback time and age integrals for one set
+    of cosmological parameters, so that every query afterwards is a spline lookup instead of an integration.
+
+    The integrals are tabulated against x = ln(1 + z) on an adaptive grid, refined until the cubic Hermite
+    spline through the nodes agrees with the directly integrated values to a relative error of rtol at the
+    midpoint of every grid interval. Redshifts outside [0, z_max] fall back to the cumulative integral used by
+    the functions above.
+
+    Arguments
+    ---------
+    parameters : list of length 3
+        A list containing the cosmological parameters, with:
+        parameter[0] = H_0 (in units of km/s/Mpc)
+        parameter[1] = omega_lam_0
+        parameter[2] = omega_m_0
+
+    z_max : float, optional
+        The largest redshift in the table. Defaults to 1100.
+
+    rtol : float, optional
+        The maximum relative error of the interpolated values. Defaults to 1e-8.
+
+    n_init : int, optional
+        The number of grid intervals to start refining from. Defaults to 64.
+
+    max_nodes : int, optional
+        The largest number of nodes the refinement is allowed to reach. Defaults to 100000.
+
+    Attributes
+    ----------
+    n_nodes : int
+        The number of nodes in the final grid.
+
+    build_time : float
+        The wall time (in s) spent building the table.
+
+    max_rel_error : float
+        The largest relative error of any interpolated quantity, measured at the midpoint of every grid interval.
+
+    dtype : numpy.dtype
+        The floating point type of the lookups, float64 unless the table comes from astype().
+
+    The z_at_* methods invert the tables : the redshift they return reproduces the target through the table
+    to a relative error of 1e-12, so it reproduces it through direct integration to within max_rel_error.
+
+    """
+
+    def __init__(self, parameters, z_max=1100.0, rtol=1e-8, n_init=64, max_nodes=100000):
+        from scipy.interpolate import CubicHermiteSpline
+        start = time.perf_counter()
+        self.cosmology = get_cosmology(parameters)
+        self.z_max = z_max
+        self.rtol = rtol
+
+        x = np.linspace(0.0, np.log1p(z_max), n_init + 1)
+        while True:
+            mid = (x[1:] + x[:-1]) / 2
+            values, slopes = self._integrate(np.concatenate((x, mid)))
+            n = len(x)
+            self._splines = [CubicHermiteSpline(x, v[:n], d[:n]) for v, d in zip(values, slopes)]
+            err = np.max([np.abs(spl(mid) / v[n:] - 1) for spl, v in zip(self._splines, values)], axis=0)
+            bad = err > rtol
+            if not bad.any() or n + bad.sum() > max_nodes:
+                break
+            x = np.sort(np.concatenate((x, mid[bad])))
+        self._x = x
+        self.n_nodes = n
+        self.max_rel_error = float(err.max())
+        self.dtype = np.dtype(np.float64)
+        self.build_time = time.perf_counter() - start
+
+    def save(self, prefix):
+        """
+        Write the table to the files prefix + '_x.npy' (the grid in x = ln(1 + z)) and prefix + '_c.npy' (the
+        piecewise polynomial coefficients of the three splines), which load() can memory-map.
+
+        Arguments
+        ---------
+        prefix : str
+            The path of the files, without the suffixes.
+
+        Returns
+        -------
+        meta : dict
+            The parameters and accuracy of the table, as expected by load().
+
+        """
+        # write to temporary files first, so that tables already mapped from the old files stay valid
+        for suffix, array in (('_x.npy', self._x), ('_c.npy', np.stack([spl.c for spl in self._splines]))):
+            with open(prefix + suffix + '.tmp', 'wb') as f:
+                np.save(f, array)
+            os.replace(prefix + suffix + '.tmp', prefix + suffix)
+        return({'parameters': list(self.cosmology.key), 'z_max': self.z_max, 'rtol': self.rtol,
+                'n_nodes': self.n_nodes, 'max_rel_error': self.max_rel_error})
+
+    @classmethod
+    def load(cls, prefix, meta, mmap_mode='r'):
+        """
+        Read a table written by save(), without integrating anything. The arrays are memory-mapped by default,
+        and the splines are evaluated directly on them.
+
+        Arguments
+        ---------
+        prefix : str
+            The path of the files, without the suffixes.
+
+        meta : dict
+            The dict returned by save().
+
+        mmap_mode : str or None, optional
+            Passed on to numpy.load. Defaults to 'r'.
+
+        Returns
+        -------
+        table : CosmologyTable
+            The table.
+
+        """
+        start = time.perf_counter()
+        table = cls.__new__(cls)
+        table.cosmology = get_cosmology(meta['parameters'])
+        table.z_max, table.rtol = meta['z_max'], meta['rtol']
+        table.n_nodes, table.max_rel_error = meta['n_nodes'], meta['max_rel_error']
+        table._x = np.load(prefix + '_x.npy', mmap_mode=mmap_mode)
+        table._coeffs = np.load(prefix + '_c.npy', mmap_mode=mmap_mode)
+        table.dtype = np.dtype(np.float64)
+        table.build_time = time.perf_counter() - start
+        return(table)
+
+    @functools.cached_property
+    def _splines(self):
+        """
+        The splines of a table read by load(), built on first use, so that loading the tables of the PRESETS
+        on import needs neither scipy.interpolate nor anything but mapping the files.
+        """
+        from scipy.interpolate import PPoly
+        return([PPoly.construct_fast(c, self._x) for c in self._coeffs])
+
+    def astype(self, dtype):
+        """
+        Get a copy of the table whose lookups take, compute in and return the given floating point type, e.g.
+        float32 to halve the memory traffic of very large catalogs. The spline coefficients are cast once and
+        evaluated with Horner's rule in that type. The error this adds is measured against this table at three
+        points of every grid interval and included in max_rel_error, which stays below 1e-5 for float32.
+
+        Arguments
+        ---------
+        dtype : dtype
+            The floating point type, e.g. numpy.float32.
+
+        Returns
+        -------
+        table : CosmologyTable
+            The table in that type (self, if it already is).
+
+        """
+        dtype = np.dtype(dtype)
+        if dtype.kind != 'f':
+            raise ValueError("dtype must be a floating point type, got {}.".format(dtype))
+        if dtype == self.dtype:
+            return(self)
+        table = self.__class__.__new__(self.__class__)
+        table.__dict__.update(self.__dict__)
+        table.dtype = dtype
+        table._x_reduced = np.asarray(self._x, dtype=dtype)
+        table._c_reduced = np.stack([spl.c for spl in self._splines]).astype(dtype)
+        x = self._x[:-1, None] + np.diff(self._x)[:, None] * np.array([0.25, 0.5, 0.75])
+        z = np.expm1(x.ravel()).astype(dtype)
+        # the cast of the redshifts is common to both tables, so only the evaluation error is measured
+        err = max(np.nanmax(np.abs(table._lookup(i, z) / self._lookup(i, z.astype(float)) - 1))
+                  for i in range(3))
+        table.max_rel_error = max(self.max_rel_error, float(err))
+        return(table)
+
+    def _integrate(self, x):
+        """
+        A helper method to directly integrate the comoving distance, lookback time and age integrals (all in
+        units of the Hubble distance or time) at the values x = ln(1 + z), along with their derivatives in x.
+        """
+        zs = np.expm1(x)
+        cosmo = self.cosmology
+        slope = cosmo.inv_E(np.exp(x))
+        return((cosmo.radial_integral(zs), cosmo.lookback_integral(zs), cosmo.age_integral(zs)),
+               (slope * np.exp(x), slope, -slope))
+
+    def _lookup(self, i, z_val):
+        """
+        A helper method to look up the i-th tabulated integral (0 : comoving distance, 1 : lookback time,
+        2 : age) at the redshift(s) z_val, falling back to direct integration outside the table.
+        """
+        z = np.asarray(z_val, dtype=self.dtype)
+        shape, z = z.shape, np.atleast_1d(z)
+        if self.dtype == np.float64:
+            out = self._splines[i](np.log1p(z))
+        else:
+            out = self._lookup_reduced(i, np.log1p(z))
+        outside = ~((z >= 0) & (z <= self.z_max))
+        if outside.any():
+            integral = (self.cosmology.radial_integral, self.cosmology.lookback_integral,
+                        self.cosmology.age_integral)[i]
+            out[outside] = integral(z[outside].astype(float))
+        return(out.reshape(shape)[()])
+
+    def _lookup_reduced(self, i, x):
+        """
+        A helper method evaluating the i-th spline at the values x = ln(1 + z) with Horner's rule, in the
+        reduced precision of astype().
+        """
+        nodes, coeffs = self._x_reduced, self._c_reduced[i]
+        interval = np.clip(np.searchsorted(nodes, x, side='right') - 1, 0, len(nodes) - 2)
+        dx = x - nodes[interval]
+        out = coeffs[0, interval]
+        for k in range(1, len(coeffs)):
+            out *= dx
+            out += coeffs[k, interval]
+        return(out)
+
+    def comoving_distance_radial(self, z_val):
+        """The (Radial) Comoving Distance (in Mpc) at the redshift(s) z_val."""
+        return(self._lookup(0, z_val) * self.cosmology.d_H)
+
+    def comoving_distance_transverse(self, z_val):
+        """The (Transverse) Comoving Distance (in Mpc) at the redshift(s) z_val."""
+        cosmo = self.cosmology
+        return(_transverse_from_radial(self.comoving_distance_radial(z_val), cosmo.H_0, cosmo.omega_k))
+
+    def comoving_volume(self, z_val):
+        """The Comoving Volume (in cubic Gpc) at the redshift(s) z_val."""
+        cosmo = self.cosmology
+        return(_volume_from_transverse(self.comoving_distance_transverse(z_val), cosmo.H_0, cosmo.omega_k))
+
+    def angulardiameter_distance(self, z_val):
+        """The Angular Diameter Distance (in Mpc) at the redshift(s) z_val."""
+        return(self.comoving_distance_transverse(z_val) / (1 + np.asarray(z_val, dtype=self.dtype)))
+
+    def linear_scale(self, z_val):
+        """The linear scale (in kpc) corresponding to an angular scale of 1" at the redshift(s) z_val."""
+        return(self.angulardiameter_distance(z_val) * arcsec * 1000)
+
+    def luminosity_distance(self, z_val):
+        """The Luminosity Distance (in Mpc) at the redshift(s) z_val."""
+        return(self.comoving_distance_transverse(z_val) * (1 + np.asarray(z_val, dtype=self.dtype)))
+
+    def distance_modulus(self, z_val, out=None):
+        """The distance modulus (in mag) at the redshift(s) z_val, written to the array out if given."""
+        z_val = np.asarray(z_val, dtype=self.dtype)[()]
+        return(_distance_modulus(self.comoving_distance_transverse(z_val), z_val, out))
+
+    def absolute_magnitude(self, apparent_mag, z_val, out=None):
+        """The absolute magnitude of sources of apparent magnitude(s) apparent_mag at the redshift(s) z_val."""
+        return(_absolute_magnitude(self, apparent_mag, z_val, out))
+
+    def t(self, z_val):
+        """The Age of the Universe (in Gyr) at the redshift(s) z_val."""
+        return(self._lookup(2, z_val) * self.cosmology.t_H)
+
+    def lightTravelTime(self, z_val):
+        """The Light Travel Time (in Gyr) from the redshift(s) z_val to z = 0."""
+        return(self._lookup(1, z_val) * self.cosmology.t_H)
+
+    def _transverse_slope(self, D):
+        """
+        A helper method for the derivative of the transverse comoving distance with respect to the radial one
+        (both in units of the Hubble distance), at the radial distance(s) D.
+        """
+        omega_k = self.cosmology.omega_k
+        if omega_k > 0:
+            return(np.cosh(np.sqrt(omega_k) * D))
+        elif omega_k == 0:
+            return(np.ones_like(D))
+        return(np.cos(np.sqrt(-omega_k) * D))
+
+    def _invert(self, f, df, target):
+        """
+        A helper method to solve f(x) = target for x = ln(1 + z) within the table, where f is increasing at
+        the nodes and df is its derivative. The node values bracket every solution, which is then refined
+        with Newton's method, kept inside its bracket. Targets outside the table give nan.
+        """
+        x = self._x
+        f_nodes = f(x)
+        if not np.all(np.diff(f_nodes) > 0):
+            raise ValueError("The quantity is not monotonic in redshift over the table, it cannot be inverted.")
+        y = np.asarray(target, dtype=float)
+        k = np.clip(np.searchsorted(f_nodes, y) - 1, 0, len(x) - 2)
+        lo, hi = x[k], x[k + 1]
+        guess = lo + (hi - lo) * (y - f_nodes[k]) / (f_nodes[k + 1] - f_nodes[k])
+        guess = np.clip(guess, lo, hi)
+        for _ in range(50):
+            f_guess = f(guess)
+            step = (f_guess - y) / df(guess)
+            guess = np.clip(guess - step, lo, hi)
+            if np.all(~(np.abs(f_guess - y) > 1e-12 * np.abs(y))):
+                break
+        # targets matching an end of the table to within its accuracy are still inverted
+        slack = self.max_rel_error * np.abs(f_nodes[[0, -1]])
+        outside = ~((y >= f_nodes[0] - slack[0]) & (y <= f_nodes[-1] + slack[1]))
+        return(np.where(outside, np.nan, np.expm1(guess))[()])
+
+    def z_at_comoving_distance(self, d_c):
+        """The redshift(s) at which the (Radial) Comoving Distance is d_c (in Mpc)."""
+        spl = self._splines[0]
+        return(self._invert(spl, spl.derivative(), np.asarray(d_c) / self.cosmology.d_H))
+
+    def z_at_luminosity_distance(self, d_l):
+        """The redshift(s) at which the Luminosity Distance is d_l (in Mpc)."""
+        cosmo, spl = self.cosmology, self._splines[0]
+        dspl = spl.derivative()
+
+        def f(x):
+            return(np.exp(x) * _transverse_from_radial(spl(x) * cosmo.d_H, cosmo.H_0, cosmo.omega_k) / cosmo.d_H)
+
+        def df(x):
+            D = spl(x)
+            return(np.exp(x) * (_transverse_from_radial(D * cosmo.d_H, cosmo.H_0, cosmo.omega_k) / cosmo.d_H
+                                + self._transverse_slope(D) * dspl(x)))
+        return(self._invert(f, df, np.asarray(d_l) / cosmo.d_H))
+
+    def z_at_age(self, t_age):
+        """The redshift(s) at which the Age of the Universe is t_age (in Gyr)."""
+        spl = self._splines[2]
+        dspl = spl.derivative()
+        return(self._invert(lambda x: -spl(x), lambda x: -dspl(x), -np.asarray(t_age) / self.cosmology.t_H))
+
+    def z_at_lookback_time(self, ltt):
+        """The redshift(s) at which the Light Travel Time to z = 0 is ltt (in Gyr)."""
+        spl = self._splines[1]
+        return(self._invert(spl, spl.derivative(), np.asarray(ltt) / self.cosmology.t_H))
+
+
+_TABLE_CACHE = _LRUCache(maxsize=16)  # CosmologyTable objects, keyed on (H_0, omega_lam_0, omega_m_0[, dtype])
+
+# Named sets of cosmological parameters [H_0, omega_lam_0, omega_m_0] : Planck 2018 (TT,TE,EE+lowE+lensing+BAO,
+# Table 2 of Planck Collaboration VI 2020), WMAP9 (WMAP+eCMB+BAO+H0, Hinshaw et al. 2013) and the concordance model
+PRESETS = {'planck18': [67.66, 0.6889, 0.3111],
+           'wmap9': [69.32, 0.7135, 0.2865],
+           'concordance': [70.0, 0.7, 0.3]}
+PRESET_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'presets')
+PRESET_RTOL = 1e-10
+
+_PRESET_TABLES = {}  # CosmologyTable objects of the PRESETS, keyed on (H_0, omega_lam_0, omega_m_0)
+
+
+def build_presets(directory=PRESET_DIR):
+    """
+    A function to build the tables of every cosmology in PRESETS and write them to directory, along with an
+    index (presets.json) read on import.
+
+    Arguments
+    ---------
+    directory : str, optional
+        The directory the tables are written to. Defaults to PRESET_DIR.
+
+    Returns
+    -------
+    index : dict
+        The contents of presets.json : the parameters and accuracy of each table, by preset name.
+
+    """
+    os.makedirs(directory, exist_ok=True)
+    index = {}
+    for name, parameters in PRESETS.items():
+        table = CosmologyTable(parameters, rtol=PRESET_RTOL)
+        index[name] = table.save(os.path.join(directory, name))
+    with open(os.path.join(directory, 'presets.json'), 'w') as f:
+        json.dump(index, f, indent=2)
+    if directory == PRESET_DIR:
+        _load_presets()
+    return(index)
+
+
+def _load_presets(directory=PRESET_DIR):
+    """
+    A helper function to memory-map the tables of the PRESETS written by build_presets(), if there are any.
+    """
+    try:
+        with open(os.path.join(directory, 'presets.json')) as f:
+            index = json.load(f)
+    except FileNotFoundError:
+        return
+    for name, meta in index.items():
+        if name in PRESETS and meta['parameters'] == PRESETS[name]:
+            table = CosmologyTable.load(os.path.join(directory, name), meta)
+            _PRESET_TABLES[table.cosmology.key] = table
+
+
+_load_presets()
+
+
+def get_table(parameters, dtype=None):
+    """
+    A function to get the CosmologyTable (with the default z_max and rtol) for a set of cosmological
+    parameters, from a process-wide LRU cache if it has been built before. The tables of the PRESETS are
+    loaded from disk instead (with a tolerance of 1e-10).
+
+    Arguments
+    ---------
+    parameters : list of length 3
+        A list containing the cosmological parameters, with:
+        parameter[0] = H_0 (in units of km/s/Mpc)
+        parameter[1] = omega_lam_0
+        parameter[2] = omega_m_0
+
+    dtype : dtype, optional
+        The floating point type of the lookups, see CosmologyTable.astype(). Defaults to float64.
+
+    Returns
+    -------
+    table : CosmologyTable
+        The table for the given parameters.
+
+    """
+    key = get_cosmology(parameters).key
+    if dtype is not None and np.dtype(dtype) != np.float64:
+        reduced_key = key + (np.dtype(dtype).str,)
+        table = _TABLE_CACHE.get(reduced_key)
+        if table is None:
+            table = get_table(list(key)).astype(dtype)
+            _TABLE_CACHE.put(reduced_key, table)
+        return(table)
+    if key in _PRESET_TABLES:
+        return(_PRESET_TABLES[key])
+    table = _TABLE_CACHE.get(key)
+    if table is None:
+        table = CosmologyTable(list(key))
+        _TABLE_CACHE.put(key, table)
+    return(table)
+
+
+def z_at_comoving_distance(parameters, d_c):
+    """
+    A function to compute the redshift at which the (radial) comoving distance takes a given value, given the
+    cosmological parameters.
+
+    Arguments
+    ---------
+    parameters : list of length 3
+        A list containing the cosmological parameters, with:
+        parameter[0] = H_0 (in units of km/s/Mpc)
+        parameter[1] = omega_lam_0
+        parameter[2] = omega_m_0
+
+    d_c : float or array_like
+        A value, or an array of values, for the (Radial) Comoving Distance (in Mpc).
+
+    Returns
+    -------
+    z_val : float or ndarray
+        The redshift(s), nan beyond the table of get_table(). comoving_distance_radial(parameters, z_val)
+        reproduces d_c to a relative error of 1e-8.
+
+    """
+    z_val = get_table(parameters).z_at_comoving_distance(d_c)
+    return(z_val)
+
+
+def z_at_luminosity_distance(parameters, d_l):
+    """
+    A function to compute the redshift at which the luminosity distance takes a given value, given the
+    cosmological parameters.
+
+    Arguments
+    ---------
+    parameters : list of length 3
+        A list containing the cosmological parameters, with:
+        parameter[0] = H_0 (in units of km/s/Mpc)
+        parameter[1] = omega_lam_0
+        parameter[2] = omega_m_0
+
+    d_l : float or array_like
+        A value, or an array of values, for the Luminosity Distance (in Mpc).
+
+    Returns
+    -------
+    z_val : float or ndarray
+        The redshift(s), nan beyond the table of get_table(). luminosity_distance(parameters, z_val)
+        reproduces d_l to a relative error of 1e-8.
+
+    """
+    z_val = get_table(parameters).z_at_luminosity_distance(d_l)
+    return(z_val)
+
+
+def z_at_age(parameters, t_age):
+    """
+    A function to compute the redshift at which the Universe had a given age, given the cosmological
+    parameters.
+
+    Arguments
+    ---------
+    parameters : list of length 3
+        A list containing the cosmological parameters, with:
+        parameter[0] = H_0 (in units of km/s/Mpc, unlike t())
+        parameter[1] = omega_lam_0
+        parameter[2] = omega_m_0
+
+    t_age : float or array_like
+        A value, or an array of values, for the Age of the Universe (in Gyr).
+
+    Returns
+    -------
+    z_val : float or ndarray
+        The redshift(s), nan beyond the table of get_table(). t() reproduces t_age at z_val to a relative
+        error of 1e-8.
+
+    """
+    z_val = get_table(parameters).z_at_age(t_age)
+    return(z_val)
+
+
+def z_at_lookback_time(parameters, ltt):
+    """
+    A function to compute the redshift from which light has travelled for a given time, given the
+    cosmological parameters.
+
+    Arguments
+    ---------
+    parameters : list of length 3
+        A list containing the cosmological parameters, with:
+        parameter[0] = H_0 (in units of km/s/Mpc, unlike lightTravelTime())
+        parameter[1] = omega_lam_0
+        parameter[2] = omega_m_0
+
+    ltt : float or array_like
+        A value, or an array of values, for the Light Travel Time (in Gyr).
+
+    Returns
+    -------
+    z_val : float or ndarray
+        The redshift(s), nan beyond the table of get_table(). lightTravelTime() reproduces ltt at z_val to a
+        relative error of 1e-8.
+
+    """
+    z_val = get_table(parameters).z_at_lookback_time(ltt)
+    return(z_val)
+
+
+# Shared memory blocks attached by each worker process of evaluate_grid()
+_GRID_SHARED = {}
+
+# The quantities evaluate_grid() can compute, all methods of Cosmology
+GRID_QUANTITIES = ('comoving_distance_radial', 'comoving_distance_transverse', 'comoving_volume',
+                   'angulardiameter_distance', 'linear_scale', 'luminosity_distance', 't', 'lightTravelTime',
+                   'differential_comoving_volume', 'distance_modulus')
+
+
+def _grid_attach(z_name, out_name, n_params, n_z):
+    """
+    A helper function run once in each worker process of evaluate_grid(), attaching the shared input
+    redshifts and output array.
+    """
+    from multiprocessing import shared_memory
+    z_shm = shared_memory.SharedMemory(name=z_name)
+    out_shm = shared_memory.SharedMemory(name=out_name)
+    _GRID_SHARED['blocks'] = (z_shm, out_shm)
+    _GRID_SHARED['z'] = np.ndarray((n_z,), dtype=float, buffer=z_shm.buf)
+    _GRID_SHARED['out'] = np.ndarray((n_params, n_z), dtype=float, buffer=out_shm.buf)
+
+
+def _grid_task(quantity, parameters, i, start, stop):
+    """
+    A helper function evaluating one task of evaluate_grid() : the given quantity for the i-th set of
+    parameters, over the redshifts [start, stop), written straight into the shared output array.
+    """
+    z = _GRID_SHARED['z'][start:stop]
+    _GRID_SHARED['out'][i, start:stop] = getattr(get_cosmology(parameters), quantity)(z)
+
+
+def evaluate_grid(params_list, z_val, quantity='luminosity_distance', workers=None, tasks_per_worker=4):
+    """
+    A function to evaluate one quantity for many sets of cosmological parameters and many redshifts, in
+    parallel over a pool of processes. The redshifts and the results are held in shared memory, so that
+    they are never pickled, and every worker writes its share of the results in place.
+
+    Arguments
+    ---------
+    params_list : list of lists of length 3, 4 or 5
+        The sets of cosmological parameters, each with:
+        parameter[0] = H_0 (in units of km/s/Mpc, also for t and lightTravelTime)
+        parameter[1] = omega_lam_0
+        parameter[2] = omega_m_0
+        parameter[3], parameter[4] = w_0, w_a (optional, see get_cosmology())
+
+    z_val : array_like
+        The values for the redshift, shared by all the sets of parameters.
+
+    quantity : str, optional
+        The quantity to compute, one of GRID_QUANTITIES. Defaults to 'luminosity_distance'.
+
+    workers : int, optional
+        The number of worker processes. Defaults to the number of CPUs. With 1 worker, everything is computed
+        in the calling process.
+
+    tasks_per_worker : int, optional
+        The redshifts are split into slices so that there are at least this many tasks per worker, to keep
+        the workers evenly loaded. Defaults to 4.
+
+    Returns
+    -------
+    values : ndarray
+        The quantity, with shape (len(params_list), len(z_val)), in the same order as the inputs.
+
+    """
+    if quantity not in GRID_QUANTITIES:
+        raise ValueError("Unknown quantity {!r}, choose from {!r}.".format(quantity, GRID_QUANTITIES))
+    z = np.ascontiguousarray(z_val, dtype=float).ravel()
+    n_params, n_z = len(params_list), len(z)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or n_params * n_z == 0:
+        values = np.empty((n_params, n_z))
+        for i, parameters in enumerate(params_list):
+            values[i] = getattr(get_cosmology(parameters), quantity)(z)
+        return(values)
+
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import shared_memory
+    n_slices = min(n_z, -(-workers * tasks_per_worker // n_params))
+    bounds = np.linspace(0, n_z, n_slices + 1).astype(int)
+    z_shm = shared_memory.SharedMemory(create=True, size=z.nbytes)
+    out_shm = shared_memory.SharedMemory(create=True, size=n_params * z.nbytes)
+    try:
+        np.ndarray(z.shape, dtype=float, buffer=z_shm.buf)[:] = z
+        with ProcessPoolExecutor(max_workers=workers, initializer=_grid_attach,
+                                 initargs=(z_shm.name, out_shm.name, n_params, n_z)) as pool:
+            futures = [pool.submit(_grid_task, quantity, list(parameters), i, start, stop)
+                       for i, parameters in enumerate(params_list)
+                       for start, stop in zip(bounds[:-1], bounds[1:])]
+            for future in futures:
+                future.result()
+        values = np.ndarray((n_params, n_z), dtype=float, buffer=out_shm.buf).copy()
+    finally:
+        z_shm.close()
+        z_shm.unlink()
+        out_shm.close()
+        out_shm.unlink()
+    return(values)
+
+
+class RedshiftSweep:
+    """
+    A class evaluating distances at a fixed array of redshifts for many sets of cosmological parameters at
+    once, e.g. for the inner loop of a likelihood over a supernova sample. Everything that does not depend on
+    the parameters is computed once : the range of x = ln(1 + z) is split into panels, the integrand is
+    sampled at order Gauss-Legendre nodes in each panel (where the powers of 1 + z are precomputed), and the
+    integrals of its polynomial interpolant from z = 0 to every redshift form a fixed matrix. Each batch of
+    parameters then costs one evaluation of 1/E(z) at the nodes and one matrix product, giving all the
+    (n_params, n_z) comoving distances at once.
+
+    Arguments
+    ---------
+    z_val : array_like
+        The redshifts. Non-finite values give nan.
+
+    order : int, optional
+        The number of nodes per panel. Defaults to 12.
+
+    panel_width : float, optional
+        The widest allowed panel, in units of ln(1 + z). Defaults to 0.25. With the default order this
+        agrees with luminosity_distance() to a relative error of about 1e-12.
+
+    max_elements : int, optional
+        The largest number of elements of the temporary arrays, bounding memory : larger batches of
+        parameters are processed in chunks. Defaults to 2**22.
+
+    """
+
+    QUANTITIES = ('comoving_distance_radial', 'comoving_distance_transverse', 'angulardiameter_distance',
+                  'luminosity_distance', 'distance_modulus')
+
+    def __init__(self, z_val, order=12, panel_width=0.25, max_elements=2 ** 22):
+        z = np.asarray(z_val, dtype=float)
+        self.shape = z.shape
+        self.z = z.ravel()
+        self.max_elements = max_elements
+        x = np.log1p(self.z)
+        self._finite = np.isfinite(x)
+        self._all_finite = self._finite.all()
+        x_fin = x[self._finite]
+        x_min, x_max = min(x_fin.min(initial=0.0), 0.0), max(x_fin.max(initial=0.0), 0.0)
+        # panels on either side of x = 0, so that the integrals start at a panel edge
+        edges = np.union1d(np.linspace(x_min, 0.0, int(np.ceil(-x_min / panel_width)) + 1),
+                           np.linspace(0.0, x_max, int(np.ceil(x_max / panel_width)) + 1))
+        nodes, weights = np.polynomial.legendre.leggauss(order)
+        # row j of basis gives the integral from -1 to t of the j-th Lagrange polynomial on the nodes, through
+        # the Legendre series of the Lagrange polynomials (columns of the inverse Vandermonde matrix)
+        to_legendre = np.linalg.inv(np.polynomial.legendre.legvander(nodes, order - 1))
+        antiderivative = np.polynomial.legendre.legint(to_legendre, lbnd=-1)
+
+        half = (edges[1:] - edges[:-1]) / 2
+        self._x = ((edges[1:] + edges[:-1])[:, None] / 2 + half[:, None] * nodes).ravel()
+        self._zp1 = np.exp(self._x)
+        # E(z)^2 = [omega_lam, omega_k, omega_m, omega_rad] @ _powers for a cosmological constant
+        self._powers = np.stack([np.ones_like(self._x), self._zp1 ** 2, self._zp1 ** 3, self._zp1 ** 4])
+
+        # the integral of the integrand over each whole panel, then from x = 0 to the start of each panel
+        full = half[:, None] * weights
+        origin = np.searchsorted(edges, 0.0)
+        matrix = np.zeros((len(self._x), len(x_fin)))
+        panel = np.clip(np.searchsorted(edges, x_fin, side='right') - 1, 0, len(half) - 1)
+        for p in range(len(half)):
+            rows = slice(p * order, (p + 1) * order)
+            # whole panels between x = 0 and the redshifts, counted negatively below x = 0
+            above = (p >= origin) & (panel > p)
+            below = (p < origin) & (panel < p)
+            matrix[rows, above] = full[p][:, None]
+            matrix[rows, below] = -full[p][:, None]
+            # the partial panel holding each redshift, from its start (above x = 0) or to its end (below)
+            inside = panel == p
+            t = (x_fin[inside] - (edges[p] + edges[p + 1]) / 2) / half[p]
+            partial = half[p] * np.polynomial.legendre.legval(t, antiderivative)
+            matrix[rows, inside] = partial if p >= origin else partial - full[p][:, None]
+        # the partial integral up to x = 0 is only zero to rounding, and the distances at z = 0 must be exactly
+        # zero (giving a distance modulus of -inf, as distance_modulus() does)
+        matrix[:, x_fin == 0] = 0
+        # the integrand is (1 + z)/E(z) in x, so the factor (1 + z) goes into the matrix
+        self._matrix = self._zp1[:, None] * matrix
+
+    def evaluate(self, params, quantity='luminosity_distance'):
+        """
+        Evaluate a distance at every redshift for every set of parameters.
+
+        Arguments
+        ---------
+        params : array_like
+            The sets of cosmological parameters, with shape (n_params, 3), (n_params, 4) or (n_params, 5) and
+            columns [H_0 (in km/s/Mpc), omega_lam_0, omega_m_0, w_0, w_a], w_0 and w_a being optional as in
+            get_cosmology(). A single set of parameters gives a single row.
+
+        quantity : str, optional
+            One of QUANTITIES : the (Radial) or (Transverse) Comoving Distance, the Angular Diameter Distance
+            or the Luminosity Distance (all in Mpc), or the distance modulus (in mag). Defaults to
+            'luminosity_distance'.
+
+        Returns
+        -------
+        values : ndarray
+            The quantity, with shape (n_params,) + the shape of z_val.
+
+        """
+        if quantity not in self.QUANTITIES:
+            raise ValueError("Unknown quantity {!r}, choose from {!r}.".format(quantity, self.QUANTITIES))
+        params = np.atleast_2d(np.asarray(params, dtype=float))
+        if params.ndim != 2 or not 3 <= params.shape[1] <= 5:
+            raise ValueError("params must have 3 to 5 columns, got shape {}.".format(params.shape))
+        values = np.empty((len(params), len(self.z))) if self._all_finite else \
+            np.full((len(params), len(self.z)), np.nan)
+        step = max(1, self.max_elements // max(len(self._x), self._matrix.shape[1], 1))
+        for start in range(0, len(params), step):
+            chunk = self._distances(params[start:start + step], quantity)
+            if self._all_finite:
+                values[start:start + step] = chunk
+            else:
+                values[start:start + step, self._finite] = chunk
+        return(values.reshape((len(params),) + self.shape))
+
+    def _distances(self, params, quantity):
+        """
+        A helper method computing the quantity at the finite redshifts for one chunk of parameters.
+        """
+        H_0, omega_lam, omega_m = params[:, 0], params[:, 1], params[:, 2]
+        omega_rad = 4.165e-5 / (H_0 / 100) ** 2
+        omega_k = 1 - omega_lam - omega_m - omega_rad
+        E2 = np.stack([omega_lam, omega_k, omega_m, omega_rad], axis=1) @ self._powers
+        if params.shape[1] > 3:
+            w_0 = params[:, 3:4]
+            w_a = params[:, 4:5] if params.shape[1] > 4 else np.zeros_like(w_0)
+            factor = np.exp(3 * (1 + w_0 + w_a) * self._x + 3 * w_a * (1 / self._zp1 - 1))
+            E2 += omega_lam[:, None] * (factor - 1)
+        D = (1 / np.sqrt(E2)) @ self._matrix
+        d_H = (c / H_0)[:, None]
+        if quantity == 'comoving_distance_radial':
+            return(D * d_H)
+        # sinh(sqrt(omega_k) D)/sqrt(omega_k), continued through omega_k = 0 and to the sine for omega_k < 0,
+        # choosing the form per set of parameters so that each row needs a single transcendental pass
+        k = omega_k[:, None]
+        curvature = k * D ** 2
+        series = np.abs(curvature).max(axis=1, initial=0.0) < 1e-6
+        d_M = D * (1 + curvature / 6)
+        for rows, function in ((~series & (omega_k > 0), np.sinh), (~series & (omega_k < 0), np.sin)):
+            if rows.any():
+                root = np.sqrt(np.abs(omega_k[rows]))[:, None]
+                d_M[rows] = function(root * D[rows]) / root
+        d_M *= d_H
+        zp1 = 1 + self.z[self._finite]
+        if quantity == 'comoving_distance_transverse':
+            return(d_M)
+        if quantity == 'angulardiameter_distance':
+            return(d_M / zp1)
+        d_L = d_M * zp1
+        if quantity == 'luminosity_distance':
+            return(d_L)
+        with np.errstate(divide='ignore'):
+            return(5 * np.log10(d_L) + 25)
+
+
+# The separations returned by pair_separations() and find_pairs(), all in Mpc except the angle (in arcsec)
+PAIR_SEPARATIONS = ('angle', 'transverse_comoving', 'transverse_physical', 'line_of_sight_comoving',
+                    'line_of_sight_physical')
+
+
+def _object_distances(parameters, ra, dec, z_val):
+    """
+    A helper function computing, once per object, the quantities the pair separations are built from : the
+    coordinates in radians, the redshifts, and the radial and transverse comoving distances (in Mpc), from
+    one cumulative integral over all the redshifts.
+    """
+    cosmo = get_cosmology(parameters)
+    ra, dec, z = np.broadcast_arrays(*(np.asarray(v, dtype=float).ravel() for v in (ra, dec, z_val)))
+    d_C = cosmo.comoving_distance_radial(z)
+    d_M = _transverse_from_radial(d_C, cosmo.H_0, cosmo.omega_k)
+    return(np.radians(ra), np.radians(dec), z, d_C, d_M)
+
+
+def _separations(objects, i, j, out=None, start=0):
+    """
+    A helper function computing the separations of the pairs (i, j) of objects (see _object_distances()),
+    into the arrays of the dict out (at the offset start) if given. The angle uses the haversine formula,
+    which stays accurate for close pairs. The transverse separation is the angle times the mean transverse
+    comoving distance of the pair, the line-of-sight one the difference of their radial comoving distances,
+    and both are divided by 1 + the mean redshift for their physical (proper) values.
+    """
+    ra, dec, z, d_C, d_M = objects
+    hav = (np.sin((dec[i] - dec[j]) / 2) ** 2
+           + np.cos(dec[i]) * np.cos(dec[j]) * np.sin((ra[i] - ra[j]) / 2) ** 2)
+    angle = 2 * np.arcsin(np.sqrt(np.minimum(hav, 1)))
+    zp1 = 1 + (z[i] + z[j]) / 2
+    transverse = angle * (d_M[i] + d_M[j]) / 2
+    line_of_sight = np.abs(d_C[i] - d_C[j])
+    values = (angle / arcsec, transverse, transverse / zp1, line_of_sight, line_of_sight / zp1)
+    if out is None:
+        return(dict(zip(PAIR_SEPARATIONS, values)))
+    for name, value in zip(PAIR_SEPARATIONS, values):
+        out[name][start:start + len(value)] = value
+    return(out)
+
+
+def pair_separations(parameters, ra, dec, z_val, i, j, chunk=1000000):
+    """
+    A function to compute the angular, transverse and line-of-sight separations of pairs of objects, given
+    the cosmological parameters and the positions and redshifts of the objects. The distances of each object
+    are computed once, and the pairs are processed in chunks, so that the memory used beyond the outputs is
+    bounded.
+
+    Arguments
+    ---------
+    parameters : list of length 3
+        A list containing the cosmological parameters, with:
+        parameter[0] = H_0 (in units of km/s/Mpc)
+        parameter[1] = omega_lam_0
+        parameter[2] = omega_m_0
+
+    ra, dec : array_like
+        The right ascensions and declinations (in degrees) of the objects.
+
+    z_val : array_like
+        The redshifts of the objects.
+
+    i, j : array_like of int
+        The indices of the two objects of each pair.
+
+    chunk : int, optional
+        The number of pairs processed at once. Defaults to 1000000.
+
+    Returns
+    -------
+    separations : dict
+        A dict of arrays with one value per pair and the entries:
+        'angle' = the angular separation (in arcsec)
+        'transverse_comoving', 'transverse_physical' = the transverse separation (in comoving and proper Mpc),
+        the angle times the mean (Transverse) Comoving Distance of the pair, over 1 + the mean redshift
+        for the proper one
+        'line_of_sight_comoving', 'line_of_sight_physical' = the line-of-sight separation (in comoving and
+        proper Mpc), the difference of the (Radial) Comoving Distances, over 1 + the mean redshift for the
+        proper one
+
+    """
+    objects = _object_distances(parameters, ra, dec, z_val)
+    i, j = np.asarray(i, dtype=np.intp).ravel(), np.asarray(j, dtype=np.intp).ravel()
+    out = {name: np.empty(len(i)) for name in PAIR_SEPARATIONS}
+    for start in range(0, len(i), chunk):
+        _separations(objects, i[start:start + chunk], j[start:start + chunk], out, start)
+    return(out)
+
+
+def _candidate_pairs_kdtree(objects, radius, chunk):
+    """
+    A generator of the candidate pairs of objects, from a KD-tree on their comoving positions (with the radial
+    comoving distance as the radius). Each object i is paired with every object closer than radius[i] (in
+    comoving Mpc) that has a lower redshift (or the same redshift and a lower index), so that each pair is found
+    once, from its higher redshift member. The candidates are yielded as arrays (i, j) of about chunk pairs at a
+    time (or those of a single object, if it has more), so that they are never all held at once.
+    """
+    ra, dec, z, d_C, d_M = objects
+    index = np.flatnonzero(np.isfinite(d_C))
+    r = d_C[index]
+    positions = np.column_stack((r * np.cos(dec[index]) * np.cos(ra[index]),
+                                 r * np.cos(dec[index]) * np.sin(ra[index]), r * np.sin(dec[index])))
+    from scipy.spatial import cKDTree
+    tree = cKDTree(positions)
+    radius = radius[index]
+    # group the objects by their number of neighbours, so that each group has about chunk candidates
+    total = np.cumsum(tree.query_ball_point(positions, radius, return_length=True))
+    first = 0
+    while first < len(index):
+        before = total[first - 1] if first else 0
+        last = max(np.searchsorted(total, before + chunk, side='right'), first + 1)
+        neighbours = tree.query_ball_point(positions[first:last], radius[first:last])
+        i = np.repeat(np.arange(first, last), [len(n) for n in neighbours])
+        j = np.concatenate([np.asarray(n, dtype=np.intp) for n in neighbours])
+        i, j = index[i], index[j]
+        lower = (z[j] < z[i]) | ((z[j] == z[i]) & (j < i))
+        yield(np.minimum(i, j)[lower], np.maximum(i, j)[lower])
+        first = last
+
+
+def find_pairs(parameters, ra, dec, z_val, r_max, pi_max=None, physical=True, method='kdtree', chunk=1000000):
+    """
+    A function to find every pair of objects whose transverse separation is at most r_max and whose
+    line-of-sight separation is at most pi_max (a cylinder, as used for pair counts and cluster finding),
+    given the cosmological parameters and the positions and redshifts of the objects, along with their
+    separations (see pair_separations()).
+
+    With method='kdtree', the candidates are the pairs closer than a radius bounding the cylinder in 3d (which
+    grows with the redshift of each object for proper separations), found with a KD-tree on the comoving
+    positions (scipy.spatial.cKDTree) about chunk candidates at a time, and only those are tested, so that the
+    memory used grows with the pairs found rather than the candidates. With method='brute', every pair is
+    tested, chunk pairs at a time.
+
+    Arguments
+    ---------
+    parameters : list of length 3
+        A list containing the cosmological parameters, with:
+        parameter[0] = H_0 (in units of km/s/Mpc)
+        parameter[1] = omega_lam_0
+        parameter[2] = omega_m_0
+
+    ra, dec : array_like
+        The right ascensions and declinations (in degrees) of the objects.
+
+    z_val : array_like
+        The redshifts of the objects.
+
+    r_max : float
+        The largest transverse separation (in Mpc).
+
+    pi_max : float, optional
+        The largest line-of-sight separation (in Mpc). Defaults to r_max.
+
+    physical : bool, optional
+        Whether r_max and pi_max are proper separations (the default) or comoving ones.
+
+    method : str, optional
+        'kdtree' (the default) or 'brute'.
+
+    chunk : int, optional
+        The number of pairs (or candidate pairs) processed at once. Defaults to 1000000.
+
+    Returns
+    -------
+    pairs : dict
+        A dict with the entries 'i' and 'j' (the indices of the objects of each pair, with i < j, sorted) and
+        the separations of each pair, as returned by pair_separations().
+
+    """
+    if method not in ('kdtree', 'brute'):
+        raise ValueError("Unknown method {!r}, choose from 'kdtree' or 'brute'.".format(method))
+    pi_max = r_max if pi_max is None else pi_max
+    objects = _object_distances(parameters, ra, dec, z_val)
+    z, d_C, d_M = objects[2:]
+    kind = 'physical' if physical else 'comoving'
+    found = []
+
+    def select(i, j):
+        separations = _separations(objects, i, j)
+        keep = ((separations['transverse_' + kind] <= r_max) & (separations['line_of_sight_' + kind] <= pi_max))
+        found.append((i[keep], j[keep], {name: value[keep] for name, value in separations.items()}))
+
+    if method == 'kdtree':
+        # the 3d distance of two objects is at most their line-of-sight separation in quadrature with their
+        # transverse separation, once the latter is scaled by the largest d_C/d_M (above 1 for closed models)
+        # and the proper separations by 1 + the redshift of the higher redshift object, which bounds the mean
+        finite = np.isfinite(d_C)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ratio = np.nanmax(np.where(d_M[finite] > 0, d_C[finite] / d_M[finite], 1.0), initial=1.0)
+        scale = 1 + z if physical else np.ones_like(z)
+        radius = np.hypot(r_max * max(ratio, 1.0), pi_max) * scale * (1 + 1e-9)
+        for i, j in _candidate_pairs_kdtree(objects, radius, chunk):
+            select(i, j)
+    else:
+        # blocks of rows of the upper triangle of the pair matrix, about chunk pairs at a time
+        n = len(z)
+        rows = max(1, chunk // max(n, 1))
+        for first in range(0, n - 1, rows):
+            i, j = np.meshgrid(np.arange(first, min(first + rows, n)), np.arange(first + 1, n), indexing='ij')
+            upper = j > i
+            select(i[upper], j[upper])
+    i = np.concatenate([f[0] for f in found]) if found else np.empty(0, dtype=np.intp)
+    j = np.concatenate([f[1] for f in found]) if found else np.empty(0, dtype=np.intp)
+    order = np.lexsort((j, i))
+    pairs = {'i': i[order], 'j': j[order]}
+    for name in PAIR_SEPARATIONS:
+        pairs[name] = np.concatenate([f[2][name] for f in found])[order] if found else np.empty(0)
+    return(pairs)
+
+
+# The public functions timed while instrumentation is enabled
+INSTRUMENTED_FUNCTIONS = ('t', 'lightTravelTime', 'comoving_distance_radial', 'comoving_distance_transverse',
+                          'comoving_volume', 'angulardiameter_distance', 'linear_scale', 'luminosity_distance',
+                          'distance_modulus', 'absolute_magnitude', 'differential_comoving_volume',
+                          'comoving_volume_shells', 'compute_all', 'pair_separations', 'find_pairs',
+                          'z_at_comoving_distance', 'z_at_luminosity_distance', 'z_at_age', 'z_at_lookback_time',
+                          'evaluate_grid')
+
+_STATS_LOCK = threading.Lock()
+_STATS_COUNTERS = ('quad_calls', 'quad_evaluations', 'quad_abserr_sum', 'quad_abserr_max',
+                   'integrand_evaluations', 'ode_calls', 'ode_evaluations')
+_STATS = dict({'functions': {}}, **{name: 0 for name in _STATS_COUNTERS})
+_ORIGINALS = {}  # the module globals replaced while instrumentation is enabled
+_INSTRUMENT_DEPTH = 0
+
+
+def instrumented(func, name=None):
+    """
+    A function to wrap func so that every call to it is counted and timed in the instrumentation statistics,
+    under the given name (func.__name__ by default). This is what enable_instrumentation() does to the
+    INSTRUMENTED_FUNCTIONS, and can be used for callers of this module (e.g. the views of flask_app).
+
+    Arguments
+    ---------
+    func : callable
+        The function to wrap.
+
+    name : str, optional
+        The name the calls are recorded under.
+
+    Returns
+    -------
+    wrapper : callable
+        The wrapped function.
+
+    """
+    name = func.__name__ if name is None else name
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return(func(*args, **kwargs))
+        finally:
+            elapsed = time.perf_counter() - start
+            with _STATS_LOCK:
+                calls, seconds = _STATS['functions'].get(name, (0, 0.0))
+                _STATS['functions'][name] = (calls + 1, seconds + elapsed)
+    return(wrapper)
+
+
+def _counting_quad(original, func, a, b, *args, **kwargs):
+    """
+    A helper function standing in for quad (the original) while instrumentation is enabled, counting the
+    calls, the integrand evaluations and the error estimates.
+    """
+    evaluations = [0]
+
+    def counted(x, *fargs):
+        evaluations[0] += 1
+        return(func(x, *fargs))
+    result = original(counted, a, b, *args, **kwargs)
+    with _STATS_LOCK:
+        _STATS['quad_calls'] += 1
+        _STATS['quad_evaluations'] += evaluations[0]
+        _STATS['quad_abserr_sum'] += result[1]
+        _STATS['quad_abserr_max'] = max(_STATS['quad_abserr_max'], result[1])
+    return(result)
+
+
+def _counting_segment_integrals(original, integrand, edges):
+    """
+    A helper function standing in for _segment_integrals while instrumentation is enabled, counting the
+    integrand evaluations of the cumulative integrals.
+    """
+    with _STATS_LOCK:
+        _STATS['integrand_evaluations'] += (len(edges) - 1) * _GL_ORDER
+    return(original(integrand, edges))
+
+
+def _counting_gauss_integral(original, integrand, a, b, accuracy):
+    """
+    A helper function standing in for _gauss_integral while instrumentation is enabled, counting the
+    integrand evaluations of the Gauss-Legendre rules.
+    """
+    def counted(x):
+        with _STATS_LOCK:
+            _STATS['integrand_evaluations'] += np.size(x)
+        return(integrand(x))
+    return(original(counted, a, b, accuracy))
+
+
+def _counting_solve_ivp(original, *args, **kwargs):
+    """
+    A helper function standing in for solve_ivp while instrumentation is enabled, counting the calls and the
+    evaluations of the right hand side.
+    """
+    sol = original(*args, **kwargs)
+    with _STATS_LOCK:
+        _STATS['ode_calls'] += 1
+        _STATS['ode_evaluations'] += sol.nfev
+    return(sol)
+
+
+def enable_instrumentation():
+    """
+    A function to start recording the instrumentation statistics, see instrumentation_stats(). Calls nest :
+    recording stops after as many calls to disable_instrumentation(). Only calls made through the module
+    (cosmoFuncs.luminosity_distance, not a name imported from it) are recorded.
+    """
+    global _INSTRUMENT_DEPTH
+    with _STATS_LOCK:
+        _INSTRUMENT_DEPTH += 1
+        if _INSTRUMENT_DEPTH > 1:
+            return
+        module = globals()
+        for name in INSTRUMENTED_FUNCTIONS:
+            _ORIGINALS[name] = module[name]
+            module[name] = instrumented(module[name])
+        for name, counting in (('quad', _counting_quad), ('_segment_integrals', _counting_segment_integrals),
+                               ('_gauss_integral', _counting_gauss_integral), ('solve_ivp', _counting_solve_ivp)):
+            # each stand-in holds its original, so that calls in progress outlive disable_instrumentation()
+            _ORIGINALS[name] = module[name]
+            module[name] = functools.partial(counting, module[name])
+
+
+def disable_instrumentation():
+    """
+    A function to stop recording the instrumentation statistics (once every call to enable_instrumentation()
+    has been matched), restoring the uninstrumented functions. The statistics are kept.
+    """
+    global _INSTRUMENT_DEPTH
+    with _STATS_LOCK:
+        if _INSTRUMENT_DEPTH == 0:
+            return
+        _INSTRUMENT_DEPTH -= 1
+        if _INSTRUMENT_DEPTH == 0:
+            globals().update(_ORIGINALS)
+            _ORIGINALS.clear()
+
+
+def instrumentation_stats():
+    """
+    A function to report the instrumentation statistics recorded so far.
+
+    Returns
+    -------
+    stats : dict
+        A dict with the entries:
+        'enabled' = whether instrumentation is currently enabled
+        'functions' = a dict of {'calls': ..., 'seconds': ...} (wall time) for every function called
+        'quad_calls', 'quad_evaluations' = the calls to quad and the integrand evaluations they made
+        'quad_abserr_sum', 'quad_abserr_max' = the sum and maximum of the error estimates returned by quad
+        'integrand_evaluations' = the integrand evaluations of the cumulative (array) integrals and of the
+        Gauss-Legendre rules (see set_integrator())
+        'ode_calls', 'ode_evaluations' = the ODE integrations (method='ode') and their right hand side evaluations
+
+    """
+    with _STATS_LOCK:
+        stats = {name: _STATS[name] for name in _STATS_COUNTERS}
+        stats['functions'] = {name: {'calls': calls, 'seconds': seconds}
+                              for name, (calls, seconds) in _STATS['functions'].items()}
+        stats['enabled'] = _INSTRUMENT_DEPTH > 0
+    return(stats)
+
+
+def reset_instrumentation():
+    """
+    A function to set every instrumentation statistic back to zero.
+    """
+    with _STATS_LOCK:
+        _STATS.update({'functions': {}}, **{name: 0 for name in _STATS_COUNTERS})
+
+
+def merge_instrumentation(stats):
+    """
+    A function to add statistics recorded elsewhere (e.g. by instrument() in a worker process) to the
+    instrumentation statistics of this process.
+
+    Arguments
+    ---------
+    stats : dict
+        The statistics, in the format of instrumentation_stats().
+
+    """
+    with _STATS_LOCK:
+        for name in _STATS_COUNTERS:
+            if name == 'quad_abserr_max':
+                _STATS[name] = max(_STATS[name], stats[name])
+            else:
+                _STATS[name] += stats[name]
+        for name, record in stats['functions'].items():
+            calls, seconds = _STATS['functions'].get(name, (0, 0.0))
+            _STATS['functions'][name] = (calls + record['calls'], seconds + record['seconds'])
+
+
+@contextmanager
+def instrument():
+    """
+    A context manager enabling instrumentation within its block, and yielding a dict which, on leaving the
+    block, holds the statistics recorded within it (in the format of instrumentation_stats()) :
+
+        with cosmoFuncs.instrument() as stats:
+            cosmoFuncs.luminosity_distance([70, 0.7, 0.3], 1.0)
+        print(stats['quad_evaluations'], stats['functions'])
+
+    """
+    # the largest error estimate is measured from zero within the block, and merged back on leaving it
+    with _STATS_LOCK:
+        abserr_max, _STATS['quad_abserr_max'] = _STATS['quad_abserr_max'], 0
+    before = instrumentation_stats()
+    stats = {}
+    enable_instrumentation()
+    try:
+        yield stats
+    finally:
+        disable_instrumentation()
+        with _STATS_LOCK:
+            block_max = _STATS['quad_abserr_max']
+            _STATS['quad_abserr_max'] = max(abserr_max, block_max)
+        after = instrumentation_stats()
+        stats.update({name: after[name] - before[name] for name in _STATS_COUNTERS})
+        stats['quad_abserr_max'] = block_max
+        stats['functions'] = {}
+        for name, record in after['functions'].items():
+            old = before['functions'].get(name, {'calls': 0, 'seconds': 0.0})
+            if record['calls'] > old['calls']:
+                stats['functions'][name] = {'calls': record['calls'] - old['calls'],
+                                            'seconds': record['seconds'] - old['seconds']}
+        stats['enabled'] = after['enabled']
+
+
+def prometheus_metrics():
+    """
+    A function to format the instrumentation statistics in the Prometheus text exposition format.
+
+    Returns
+    -------
+    text : str
+        The metrics, all prefixed by cosmofuncs_.
+
+    """
+    stats = instrumentation_stats()
+    lines = []
+
+    def metric(name, kind, doc, samples):
+        lines.extend(['# HELP cosmofuncs_{} {}'.format(name, doc), '# TYPE cosmofuncs_{} {}'.format(name, kind)])
+        lines.extend('cosmofuncs_{}{} {!r}'.format(name, labels, float(value)) for labels, value in samples)
+
+    functions = sorted(stats['functions'].items())
+    metric('calls_total', 'counter', 'Calls of each instrumented function.',
+           [('{{function="{}"}}'.format(name), record['calls']) for name, record in functions])
+    metric('seconds_total', 'counter', 'Wall time spent in each instrumented function.',
+           [('{{function="{}"}}'.format(name), record['seconds']) for name, record in functions])
+    metric('quad_calls_total', 'counter', 'Calls to scipy.integrate.quad.', [('', stats['quad_calls'])])
+    metric('quad_evaluations_total', 'counter', 'Integrand evaluations made by quad.',
+           [('', stats['quad_evaluations'])])
+    metric('quad_abserr_total', 'counter', 'Sum of the absolute error estimates returned by quad.',
+           [('', stats['quad_abserr_sum'])])
+    metric('quad_abserr_max', 'gauge', 'Largest absolute error estimate returned by quad.',
+           [('', stats['quad_abserr_max'])])
+    metric('integrand_evaluations_total', 'counter',
+           'Integrand evaluations made by the cumulative integrals and the Gauss-Legendre rules.',
+           [('', stats['integrand_evaluations'])])
+    metric('ode_calls_total', 'counter', 'ODE integrations.', [('', stats['ode_calls'])])
+    metric('ode_evaluations_total', 'counter', 'Right hand side evaluations made by the ODE integrations.',
+           [('', stats['ode_evaluations'])])
+    metric('instrumentation_enabled', 'gauge', 'Whether instrumentation is enabled.', [('', stats['enabled'])])
+    return('\n'.join(lines) + '\n')
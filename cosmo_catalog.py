@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Command-line tool computing distances and times for a catalog of redshifts stored on disk, without loading
+it in memory : the redshift column is memory-mapped, processed chunk by chunk, and every output quantity is
+written to its own memory-mapped .npy file.
+
+Usage : python cosmo_catalog.py redshifts.npy --H0 70 --omega-m 0.3 --quantities d_L,d_A -o out/
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import cosmoFuncs as cf
+
+# The quantities the tool can compute, mapped to the methods of cf.Cosmology and cf.CosmologyTable
+QUANTITIES = {'d_C': 'comoving_distance_radial',
+              'd_M': 'comoving_distance_transverse',
+              'd_A': 'angulardiameter_distance',
+              'd_L': 'luminosity_distance',
+              'V_c': 'comoving_volume',
+              'scale': 'linear_scale',
+              'lookback': 'lightTravelTime',
+              'age': 't'}
+
+
+def open_redshifts(path, dtype='<f8'):
+    """
+    Memory-map a redshift column, either a 1-d .npy file or a raw binary file of the given dtype.
+    """
+    if path.endswith('.npy'):
+        z = np.load(path, mmap_mode='r')
+    else:
+        z = np.memmap(path, dtype=dtype, mode='r')
+    if z.ndim != 1:
+        raise ValueError("Expected a single column of redshifts, got shape {}.".format(z.shape))
+    return(z)
+
+
+def process(z, cosmo, quantities, out_dir, stem, chunk=1000000, report=None, dtype=float):
+    """
+    Compute the quantities for every redshift in z, chunk by chunk, into memory-mapped .npy files of the
+    given dtype named <stem>_<quantity>.npy in out_dir. cosmo is a cf.Cosmology or a cf.CosmologyTable (in
+    that dtype, see cf.CosmologyTable.astype), and report, if given, is called after every chunk with the
+    number of rows done and the elapsed time.
+
+    Returns the paths of the output files.
+    """
+    paths = [os.path.join(out_dir, '{}_{}.npy'.format(stem, q)) for q in quantities]
+    outputs = [np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=z.shape) for path in paths]
+    start = time.perf_counter()
+    for begin in range(0, len(z), chunk):
+        z_chunk = np.asarray(z[begin:begin + chunk], dtype=dtype)
+        for q, out in zip(quantities, outputs):
+            out[begin:begin + len(z_chunk)] = getattr(cosmo, QUANTITIES[q])(z_chunk)
+        if report is not None:
+            report(begin + len(z_chunk), time.perf_counter() - start)
+    for out in outputs:
+        out.flush()
+    return(paths)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('input', help="redshift column, as a .npy file or raw binary (see --dtype)")
+    parser.add_argument('-o', '--output-dir', default='.', help="directory for the output .npy files")
+    parser.add_argument('--H0', type=float, required=True, help="Hubble's constant, in km/s/Mpc")
+    parser.add_argument('--omega-m', type=float, required=True, help="matter density")
+    parser.add_argument('--omega-lam', type=float, default=None, help="dark energy density (default : flat)")
+    parser.add_argument('--w0', type=float, default=-1.0, help="dark energy equation of state today (default : -1)")
+    parser.add_argument('--wa', type=float, default=0.0, help="its evolution, w = w0 + wa z/(1 + z) (default : 0)")
+    parser.add_argument('--quantities', default='d_L',
+                        help="comma separated quantities, among {} (default : d_L)".format(', '.join(QUANTITIES)))
+    parser.add_argument('--chunk', type=int, default=1000000, help="rows per chunk (default : 1000000)")
+    parser.add_argument('--dtype', default='<f8', help="dtype of a raw binary input (default : <f8)")
+    parser.add_argument('--out-dtype', default='float64', choices=('float64', 'float32'),
+                        help="dtype of the computation and outputs; float32 halves the memory traffic for a "
+                             "relative error below 1e-5 (default : float64)")
+    parser.add_argument('--exact', action='store_true',
+                        help="integrate every chunk instead of interpolating a precomputed CosmologyTable")
+    parser.add_argument('--rtol', type=float, default=1e-8, help="relative accuracy of the table (default : 1e-8)")
+    parser.add_argument('--z-max', type=float, default=1100.0, help="largest redshift in the table (default : 1100)")
+    parser.add_argument('-q', '--quiet', action='store_true', help="do not report progress")
+    args = parser.parse_args(argv)
+
+    quantities = [q.strip() for q in args.quantities.split(',') if q.strip()]
+    unknown = [q for q in quantities if q not in QUANTITIES]
+    if unknown or not quantities:
+        parser.error("unknown quantities {!r}, choose from {}".format(unknown, ', '.join(QUANTITIES)))
+    if args.chunk < 1:
+        parser.error("--chunk must be positive")
+    omega_lam = 1 - args.omega_m if args.omega_lam is None else args.omega_lam
+    parameters = [args.H0, omega_lam, args.omega_m, args.w0, args.wa]
+
+    z = open_redshifts(args.input, args.dtype)
+    if args.exact:
+        cosmo = cf.get_cosmology(parameters)
+    else:
+        cosmo = cf.CosmologyTable(parameters, z_max=args.z_max, rtol=args.rtol).astype(args.out_dtype)
+        if not args.quiet:
+            print("Built table : {} nodes in {:.3f} s, max relative error {:.2g}".format(
+                cosmo.n_nodes, cosmo.build_time, cosmo.max_rel_error), file=sys.stderr)
+
+    def report(done, elapsed):
+        print("\r{:,} / {:,} rows ({:.1f}%), {:.3g} rows/s".format(
+            done, len(z), 100 * done / max(len(z), 1), done / max(elapsed, 1e-12)), end='', file=sys.stderr)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(args.input))[0]
+    start = time.perf_counter()
+    paths = process(z, cosmo, quantities, args.output_dir, stem, args.chunk, None if args.quiet else report,
+                    args.out_dtype)
+    if not args.quiet:
+        elapsed = time.perf_counter() - start
+        print("\nDone : {:,} rows in {:.2f} s ({:.3g} rows/s)".format(len(z), elapsed, len(z) / max(elapsed, 1e-12)),
+              file=sys.stderr)
+        for path in paths:
+            print(path)
+
+
+if __name__ == '__main__':
+    main()
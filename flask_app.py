@@ -6,16 +6,183 @@ Created on Tue Mar 31 21:46:31 2020
 @author: Bharath Saiguhan
 """
 
-from flask import Flask, render_template, request
-import pandas as pd
+import html
+import io
+import json
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError
+
+from flask import Flask, Response, render_template, request, stream_with_context
+import numpy as np
 import cosmoFuncs as cf
+from result_cache import ResultCache, canonical_key
 
 app = Flask(__name__)
 
+# The cosmoFuncs computations of every request run on a bounded executor instead of the request thread. The
+# executor ('thread' or 'process'), its number of workers, the number of computations allowed in flight
+# (running or queued) before new requests are turned away with a 503, and the time a request waits for its
+# result before giving up with a 504 are read from the environment.
+EXECUTOR = os.environ.get('COSMOCALC_EXECUTOR', 'thread')
+WORKERS = int(os.environ.get('COSMOCALC_WORKERS', os.cpu_count() or 1))
+MAX_IN_FLIGHT = int(os.environ.get('COSMOCALC_MAX_IN_FLIGHT', 4 * WORKERS))
+TIMEOUT = float(os.environ.get('COSMOCALC_TIMEOUT', 10.0))
+
+_executor = None
+_executor_lock = threading.Lock()
+_metrics_lock = threading.Lock()
+_metrics = {'submitted': 0, 'completed': 0, 'failed': 0, 'rejected': 0, 'timed_out': 0, 'in_flight': 0}
+_latencies = deque(maxlen=1000)  # seconds, of the most recent completed computations
+
+# The results of the calculator are kept in an SQLite file shared by every worker process (in the instance
+# folder by default, COSMOCALC_CACHE='' disables it), with a time-to-live in seconds and a maximum size.
+RESULT_CACHE_PATH = os.environ.get('COSMOCALC_CACHE', os.path.join(app.instance_path, 'results.sqlite'))
+RESULT_CACHE_TTL = float(os.environ.get('COSMOCALC_CACHE_TTL', 30 * 86400.0))
+RESULT_CACHE_SIZE = int(os.environ.get('COSMOCALC_CACHE_SIZE', 100000))
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+class ComputeUnavailable(RuntimeError):
+    """A computation that was turned away (503) or did not finish in time (504)."""
+
+    def __init__(self, message, status):
+        super().__init__(message)
+        self.status = status
+
+
+def _get_executor():
+    """
+    Return the executor the computations run on, creating it on first use (so that importing this module,
+    e.g. from a process pool worker, does not start one).
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            pool = ProcessPoolExecutor if EXECUTOR == 'process' else ThreadPoolExecutor
+            _executor = pool(max_workers=WORKERS)
+        return(_executor)
+
+
+def _get_result_cache():
+    """
+    Return the shared result cache, opening it on first use, or None if it is disabled.
+    """
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None and RESULT_CACHE_PATH:
+            _result_cache = ResultCache(RESULT_CACHE_PATH, ttl=RESULT_CACHE_TTL, max_entries=RESULT_CACHE_SIZE)
+        return(_result_cache)
+
+
+def _count(name, delta=1):
+    with _metrics_lock:
+        _metrics[name] += delta
+
+
+def _finished(future, start, instrumented):
+    """
+    Release the slot of a computation once it has really finished, whether or not its request is still
+    waiting for it, so that computations abandoned after a timeout still count against MAX_IN_FLIGHT.
+    The statistics recorded by an instrumented computation in a worker process are added to those of this
+    process.
+    """
+    with _metrics_lock:
+        _metrics['in_flight'] -= 1
+        if future.cancelled() or future.exception() is not None:
+            _metrics['failed'] += 1
+            return
+        _metrics['completed'] += 1
+        _latencies.append(time.perf_counter() - start)
+    if instrumented:
+        cf.merge_instrumentation(future.result()[1])
+
+
+def _instrumented_call(func, *args):
+    """
+    Run func(*args) with instrumentation enabled (in a worker process), returning its result along with the
+    statistics recorded. func itself arrives uninstrumented, so its call is timed here.
+    """
+    with cf.instrument() as stats:
+        result = cf.instrumented(func)(*args)
+    return(result, stats)
+
+
+def offload(func, *args, timeout=None):
+    """
+    Run func(*args) on the executor and wait at most timeout seconds (TIMEOUT by default) for its result.
+    Raises ComputeUnavailable with status 503 when MAX_IN_FLIGHT computations are already running or
+    queued, and with status 504 when the result does not arrive in time.
+    """
+    with _metrics_lock:
+        if _metrics['in_flight'] >= MAX_IN_FLIGHT:
+            _metrics['rejected'] += 1
+            raise ComputeUnavailable("The server is busy, try again shortly.", 503)
+        _metrics['in_flight'] += 1
+        _metrics['submitted'] += 1
+    # worker processes do not share the instrumentation statistics, so they send theirs back with the result
+    instrumented = EXECUTOR == 'process' and INSTRUMENT
+    if instrumented:
+        func, args = _instrumented_call, (func,) + args
+    start = time.perf_counter()
+    try:
+        future = _get_executor().submit(func, *args)
+    except Exception:
+        _count('in_flight', -1)
+        raise
+    future.add_done_callback(lambda f: _finished(f, start, instrumented))
+    try:
+        result = future.result(timeout=TIMEOUT if timeout is None else timeout)
+        return(result[0] if instrumented else result)
+    except TimeoutError:
+        future.cancel()
+        _count('timed_out')
+        raise ComputeUnavailable("The computation did not finish within {:g} s.".format(
+            TIMEOUT if timeout is None else timeout), 504)
+
+
+# The rows of the results table, as (label, key in cf.compute_all(), unit used when the value is below 1,
+# unit used otherwise, factor converting the value to the smaller unit)
+RESULT_ROWS = [
+    ('Age of Universe (at z = 0)', 'age_0', 'Myr', 'Gyr', 1e3),
+    ('Age of Universe (at z = {redshift:.3f})', 'age', 'Myr', 'Gyr', 1e3),
+    ('Light Travel Time', 'light_travel_time', 'Myr', 'Gyr', 1e3),
+    ('Comoving Distance', 'comoving_distance_radial', 'kpc', 'Mpc', 1e3),
+    ('Comoving Volume', 'comoving_volume', 'cubic Mpc', 'cubic Gpc', 1e9),
+    ('Angular Diameter Distance', 'angulardiameter_distance', 'kpc', 'Mpc', 1e3),
+    ('Angular Scale', 'linear_scale', 'pc/\'\'', 'kpc/\'\'', 1e3),
+    ('Luminosity Distance', 'luminosity_distance', 'kpc', 'Mpc', 1e3),
+]
+
+
+def results_table(results):
+    """
+    Render the results (a dict of label : formatted value) as the HTML table of the page, with the markup
+    pandas.DataFrame.to_html(classes="results") used to produce, which the stylesheet is written for.
+    """
+    rows = ''.join('    <tr>\n      <th>{}</th>\n      <td>{}</td>\n    </tr>\n'.format(
+        html.escape(label, quote=False), html.escape(value, quote=False)) for label, value in results.items())
+    return('<table border="1" class="dataframe results">\n  <thead>\n    <tr style="text-align: right;">\n'
+           '      <th></th>\n      <th>Values</th>\n    </tr>\n  </thead>\n  <tbody>\n' + rows
+           + '  </tbody>\n</table>')
+
+
+# The names shown in the form for the preset cosmologies of cf.PRESETS
+PRESET_LABELS = {'planck18': 'Planck 2018', 'wmap9': 'WMAP9', 'concordance': 'Concordance (70, 0.3, 0.7)'}
+
+
+@app.context_processor
+def inject_presets():
+    return({'presets': PRESET_LABELS})
+
 
 @app.route('/', methods=["GET", "POST"])
 def home():
-    error_red = error_h = error_m = error_vac = ""
+    error_red = error_h = error_m = error_vac = error_neg = ""
     if request.method == "POST":
         z_user = None
         H = None
@@ -29,16 +196,24 @@ def home():
         except:
             error_red += "{!r} is not a number! Enter a valid redshift.".format(
                 form_inputs['redshift'])
-        try:
-            H = float(form_inputs['hubblepar'])
-        except:
-            error_h += "{!r} is not a number! Enter a valid value for the Hubble parameter.".format(
-                form_inputs['hubblepar'])
-        try:
-            Omega_m = float(form_inputs['omega_m'])
-        except:
-            error_m += "{!r} is not a number! Enter a valid value for mass density.".format(
-                form_inputs['omega_m'])
+        preset = None
+        if form_inputs.get('submit_button') == "Preset":
+            preset = form_inputs.get('preset')
+            if preset in cf.PRESETS:
+                H, Omega_vac, Omega_m = cf.PRESETS[preset]
+            else:
+                error_h += "{!r} is not a known cosmology! Choose one of the presets.".format(preset)
+        else:
+            try:
+                H = float(form_inputs['hubblepar'])
+            except:
+                error_h += "{!r} is not a number! Enter a valid value for the Hubble parameter.".format(
+                    form_inputs['hubblepar'])
+            try:
+                Omega_m = float(form_inputs['omega_m'])
+            except:
+                error_m += "{!r} is not a number! Enter a valid value for mass density.".format(
+                    form_inputs['omega_m'])
         if len(error_red) != 0 or len(error_m) != 0 or len(error_h) != 0:
             return render_template("home.html", error_1=error_red, error_2=error_h, error_3=error_m, error_4=error_vac)
         if len(error_red) == 0 and len(error_m) == 0 and len(error_h) == 0 and z_user is not None and H is not None and Omega_m is not None:
@@ -46,228 +221,312 @@ def home():
                 error_neg = "Got negative redshift! Going to assume you meant positive..."
                 z_user = -1 * z_user
             if request.form['submit_button'] == "Flat":
-                params = [H, 1 - Omega_m, Omega_m]
-                if (cf.t(
-                        [cf.convertH(H), 1 - Omega_m, Omega_m], 0.0) < 1):
-                    results['Age of Universe (at z = 0) [in Myr]'] = "{:.3f}".format(cf.t(
-                        [cf.convertH(H), 1 - Omega_m, Omega_m], 0.0) * 1000)
-                else:
-                    results['Age of Universe (at z = 0) [in Gyr]'] = "{:.3f}".format(cf.t(
-                        [cf.convertH(H), 1 - Omega_m, Omega_m], 0.0))
-
-                if (cf.t([cf.convertH(H), 1 - Omega_m, Omega_m], z_user) < 1):
-                    results['Age of Universe (at z = {redshift:.3f}) [in Myr]'.format(
-                        redshift=z_user)] = "{:.3f}".format(cf.t([cf.convertH(H), 1 - Omega_m, Omega_m], z_user) * 1000)
-                else:
-                    results['Age of Universe (at z = {redshift:.3f}) [in Gyr]'.format(
-                        redshift=z_user)] = "{:.3f}".format(cf.t([cf.convertH(H), 1 - Omega_m, Omega_m], z_user))
-
-                if (cf.lightTravelTime(
-                        [cf.convertH(H), 1 - Omega_m, Omega_m], z_user) < 1):
-                    results['Light Travel Time [in Myr]'] = "{:.3f}".format(cf.lightTravelTime(
-                        [cf.convertH(H), 1 - Omega_m, Omega_m], z_user) * 1000)
-                else:
-                    results['Light Travel Time [in Gyr]'] = "{:.3f}".format(cf.lightTravelTime(
-                        [cf.convertH(H), 1 - Omega_m, Omega_m], z_user))
-
-                if (cf.comoving_distance_radial(
-                        params, z_user) < 1):
-                    results['Comoving Distance [in kpc]'] = "{:.3f}".format(cf.comoving_distance_radial(
-                        params, z_user) * 1000)
-                else:
-                    results['Comoving Distance [in Mpc]'] = "{:.3f}".format(cf.comoving_distance_radial(
-                        params, z_user))
-
-                if (cf.comoving_volume(
-                        params, z_user) < 1):
-                    results['Comoving Volume [in cubic Mpc]'] = "{:.3f}".format(cf.comoving_volume(
-                        params, z_user) * 1e9)
-                else:
-                    results['Comoving Volume [in cubic Gpc]'] = "{:.3f}".format(cf.comoving_volume(
-                        params, z_user))
-
-                if(cf.angulardiameter_distance(
-                        params, z_user) < 1):
-                    results['Angular Diameter Distance [in kpc]'] = "{:.3f}".format(cf.angulardiameter_distance(
-                        params, z_user) * 1000)
-                else:
-                    results['Angular Diameter Distance [in Mpc]'] = "{:.3f}".format(cf.angulardiameter_distance(
-                        params, z_user))
-
-                if (format(cf.linear_scale(
-                        params, z_user) < 1)):
-                    results['Angular Scale [in pc/\'\']'] = "{:.3f}".format(cf.linear_scale(
-                        params, z_user) * 1000)
-                else:
-                    results['Angular Scale [in kpc/\'\']'] = "{:.3f}".format(cf.linear_scale(
-                        params, z_user))
-
-                if (cf.luminosity_distance(
-                        params, z_user) < 1):
-                    results['Luminosity Distance [in kpc]'] = "{:.3f}".format(cf.luminosity_distance(
-                        params, z_user) * 1000)
-                else:
-                    results['Luminosity Distance [in Mpc]'] = "{:.3f}".format(cf.luminosity_distance(
-                        params, z_user))
-
-                results_df = pd.DataFrame.from_dict(
-                    results, orient='index', columns=['Values'])
-                results_table = results_df.to_html(classes="results")
-                return render_template("home.html", table=results_table, rs=str(z_user), hpar=str(H), om=str(Omega_m), de=str(params[1]), error_5 = error_neg)
+                Omega_vac = 1 - Omega_m
             elif request.form['submit_button'] == "Open":
-                params = [H, 0.0, Omega_m]
-                if (cf.t(
-                        [cf.convertH(H), 0.0, Omega_m], 0.0) < 1):
-                    results['Age of Universe (at z = 0) [in Myr]'] = "{:.3f}".format(cf.t(
-                        [cf.convertH(H), 0.0, Omega_m], 0.0) * 1e3)
-                else:
-                    results['Age of Universe (at z = 0) [in Gyr]'] = "{:.3f}".format(cf.t(
-                        [cf.convertH(H), 0.0, Omega_m], 0.0))
-
-                if (cf.t([cf.convertH(H), 0.0, Omega_m], z_user) < 1):
-                    results['Age of Universe (at z = {redshift:.3f}) [in Myr]'.format(
-                        redshift=z_user)] = "{:.3f}".format(cf.t([cf.convertH(H), 0.0, Omega_m], z_user) * 1e3)
-                else:
-                    results['Age of Universe (at z = {redshift:.3f}) [in Gyr]'.format(
-                        redshift=z_user)] = "{:.3f}".format(cf.t([cf.convertH(H), 0.0, Omega_m], z_user))
-
-                if (cf.lightTravelTime(
-                        [cf.convertH(H), 0.0, Omega_m], z_user) < 1):
-                    results['Light Travel Time [in Myr]'] = "{:.3f}".format(cf.lightTravelTime(
-                        [cf.convertH(H), 0.0, Omega_m], z_user) * 1000)
-                else:
-                    results['Light Travel Time [in Gyr]'] = "{:.3f}".format(cf.lightTravelTime(
-                        [cf.convertH(H), 0.0, Omega_m], z_user))
-
-                if (cf.comoving_distance_radial(
-                        params, z_user) < 1):
-                    results['Comoving Distance [in kpc]'] = "{:.3f}".format(cf.comoving_distance_radial(
-                        params, z_user) * 1e3)
-                else:
-                    results['Comoving Distance [in Mpc]'] = "{:.3f}".format(cf.comoving_distance_radial(
-                        params, z_user))
-
-                if (cf.comoving_volume(
-                        params, z_user) < 1):
-                    results['Comoving Volume [in cubic Mpc]'] = "{:.3f}".format(cf.comoving_volume(
-                        params, z_user) * 1e9)
-                else:
-                    results['Comoving Volume [in cubic Gpc]'] = "{:.3f}".format(cf.comoving_volume(
-                        params, z_user))
-
-                if (cf.angulardiameter_distance(
-                        params, z_user) < 1):
-                    results['Angular Diameter Distance [in Mpc]'] = "{:.3f}".format(cf.angulardiameter_distance(
-                        params, z_user) * 1e3)
-                else:
-                    results['Angular Diameter Distance [in Gpc]'] = "{:.3f}".format(cf.angulardiameter_distance(
-                        params, z_user))
-
-                if (cf.linear_scale(
-                        params, z_user) < 1):
-                    results['Angular Scale [in pc/\'\']'] = "{:.3f}".format(cf.linear_scale(
-                        params, z_user) * 1e3)
-                else:
-                    results['Angular Scale [in kpc/\'\']'] = "{:.3f}".format(cf.linear_scale(
-                        params, z_user))
-
-                if (cf.luminosity_distance(
-                        params, z_user) < 1):
-                    results['Luminosity Distance [in kpc]'] = "{:.3f}".format(cf.luminosity_distance(
-                        params, z_user) * 1e3)
-                else:
-                    results['Luminosity Distance [in Mpc]'] = "{:.3f}".format(cf.luminosity_distance(
-                        params, z_user))
-
-                results_df = pd.DataFrame.from_dict(
-                    results, orient='index', columns=['Values'])
-                results_table = results_df.to_html(classes="results")
-                return render_template("home.html", table=results_table, rs=str(z_user), hpar=str(H), om=str(Omega_m), de=str(params[1]))
+                Omega_vac = 0.0
             elif request.form['submit_button'] == "General":
                 try:
                     Omega_vac = float(form_inputs['omega_vac'])
                 except:
                     error_vac += "{!r} is not a number! Enter valid value for dark energy density.".format(
                         form_inputs['omega_vac'])
-                if len(error_red) != 0 or len(error_m) != 0 or len(error_h) != 0 or len(error_vac) != 0:
+                if len(error_vac) != 0:
                     return render_template("home.html", error_1=error_red, error_2=error_h, error_3=error_m, error_4=error_vac)
-                if len(error_red) == 0 and len(error_m) == 0 and len(error_h) == 0 and len(error_vac) == 0 and Omega_vac is not None:
-                    params = [H, Omega_vac, Omega_m]
-                    if (cf.t(
-                            [cf.convertH(H), Omega_vac, Omega_m], 0.0) < 1):
-                        results['Age of Universe (at z = 0) [in Myr]'] = "{:.3f}".format(cf.t(
-                            [cf.convertH(H), Omega_vac, Omega_m], 0.0) * 1e3)
+            if Omega_vac is not None:
+                params = [H, Omega_vac, Omega_m]
+                cache = _get_result_cache()
+                key = canonical_key(H, Omega_m, Omega_vac, z_user)
+                outputs = cache.get(key) if cache is not None else None
+                if outputs is None:
+                    try:
+                        # the tables of the presets are memory-mapped, looking them up needs no integration
+                        outputs = offload(cf.compute_all, params, z_user, 'table' if preset else 'integral')
+                    except ComputeUnavailable as err:
+                        return(render_template("home.html", error_1=str(err)), err.status)
+                    if cache is not None:
+                        cache.put(key, outputs)
+                for label, key, small_unit, large_unit, factor in RESULT_ROWS:
+                    label = label.format(redshift=z_user)
+                    if outputs[key] < 1:
+                        results['{} [in {}]'.format(label, small_unit)] = "{:.3f}".format(
+                            outputs[key] * factor)
                     else:
-                        results['Age of Universe (at z = 0) [in Gyr]'] = "{:.3f}".format(cf.t(
-                            [cf.convertH(H), Omega_vac, Omega_m], 0.0))
+                        results['{} [in {}]'.format(label, large_unit)] = "{:.3f}".format(
+                            outputs[key])
 
-                    if (cf.t([cf.convertH(H), Omega_vac, Omega_m], z_user) < 1):
-                        results['Age of Universe (at z = {redshift:.3f}) [in Myr]'.format(
-                            redshift=z_user)] = "{:.3f}".format(cf.t([cf.convertH(H), Omega_vac, Omega_m], z_user) * 1e3)
-                    else:
-                        results['Age of Universe (at z = {redshift:.3f}) [in Gyr]'.format(
-                            redshift=z_user)] = "{:.3f}".format(cf.t([cf.convertH(H), Omega_vac, Omega_m], z_user))
-
-                    if(cf.lightTravelTime(
-                            [cf.convertH(H), Omega_vac, Omega_m], z_user) < 1):
-                        results['Light Travel Time [in Myr]'] = "{:.3f}".format(cf.lightTravelTime(
-                            [cf.convertH(H), Omega_vac, Omega_m], z_user) * 1e3)
-                    else:
-                        results['Light Travel Time [in Gyr]'] = "{:.3f}".format(cf.lightTravelTime(
-                            [cf.convertH(H), Omega_vac, Omega_m], z_user))
-
-                    if(cf.comoving_distance_radial(
-                            params, z_user) < 1):
-                        results['Comoving Distance [in kpc]'] = "{:.3f}".format(cf.comoving_distance_radial(
-                            params, z_user) * 1e3)
-                    else:
-                        results['Comoving Distance [in Mpc]'] = "{:.3f}".format(cf.comoving_distance_radial(
-                            params, z_user))
-
-                    if(cf.comoving_volume(
-                            params, z_user) < 1):
-                        results['Comoving Volume [in cubic Mpc]'] = "{:.3f}".format(cf.comoving_volume(
-                            params, z_user) * 1e9)
-                    else:
-                        results['Comoving Volume [in cubic Gpc]'] = "{:.3f}".format(cf.comoving_volume(
-                            params, z_user))
-
-                    if(cf.angulardiameter_distance(
-                            params, z_user) < 1):
-                        results['Angular Diameter Distance [in kpc]'] = "{:.3f}".format(cf.angulardiameter_distance(
-                            params, z_user) * 1e3)
-                    else:
-                        results['Angular Diameter Distance [in Mpc]'] = "{:.3f}".format(cf.angulardiameter_distance(
-                            params, z_user))
-
-                    if(cf.linear_scale(
-                            params, z_user) < 1):
-                        results['Angular Scale [in pc/\'\']'] = "{:.3f}".format(cf.linear_scale(
-                            params, z_user) * 1e3)
-                    else:
-                        results['Angular Scale [in kpc/\'\']'] = "{:.3f}".format(cf.linear_scale(
-                            params, z_user))
-
-                    if(cf.luminosity_distance(
-                            params, z_user) < 1):
-                        results['Luminosity Distance [in kpc]'] = "{:.3f}".format(cf.luminosity_distance(
-                            params, z_user) * 1e3)
-                    else:
-                        results['Luminosity Distance [in Mpc]'] = "{:.3f}".format(cf.luminosity_distance(
-                            params, z_user))
-
-                    results_df = pd.DataFrame.from_dict(
-                        results, orient='index', columns=['Values'])
-                    results_table = results_df.to_html(classes="results")
-                    return render_template("home.html", table=results_table, rs=str(z_user), hpar=str(H), om=str(Omega_m), de=str(params[1]))
+                return render_template("home.html", table=results_table(results), rs=str(z_user), hpar=str(H), om=str(Omega_m), de=str(params[1]), error_5=error_neg)
     if request.method == "GET":
         return render_template("home.html")
 
 
+# The quantities /api/batch can return, all keys of cf.compute_all()
+BATCH_QUANTITIES = ['age', 'light_travel_time', 'comoving_distance_radial', 'comoving_distance_transverse',
+                    'comoving_volume', 'angulardiameter_distance', 'linear_scale', 'luminosity_distance']
+
+
+class BatchError(ValueError):
+    """An invalid /api/batch request, reported back to the client with a 400 status."""
+
+
+def _batch_parameters(fields):
+    """
+    Read the cosmology (H0, omega_m, omega_lam, and optionally the dark energy equation of state w0, wa) and
+    the requested quantities out of a mapping (query string or JSON body). omega_lam defaults to 1 - omega_m,
+    w0 to -1, wa to 0, and quantities (a list, or a comma separated string) to every one of BATCH_QUANTITIES.
+    """
+    missing = [name for name in ('H0', 'omega_m') if name not in fields]
+    if missing:
+        raise BatchError("Missing cosmological parameter(s) {!r}.".format(missing))
+    try:
+        H = float(fields['H0'])
+        Omega_m = float(fields['omega_m'])
+        Omega_vac = float(fields.get('omega_lam', 1 - Omega_m))
+        w = [float(fields.get('w0', -1.0)), float(fields.get('wa', 0.0))]
+    except (TypeError, ValueError) as err:
+        raise BatchError("Invalid cosmological parameter : {}".format(err))
+    quantities = fields.get('quantities', BATCH_QUANTITIES)
+    if isinstance(quantities, str):
+        quantities = [q.strip() for q in quantities.split(',') if q.strip()]
+    elif not isinstance(quantities, (list, tuple)) or not all(isinstance(q, str) for q in quantities):
+        raise BatchError("'quantities' must be a comma separated string or a list of strings, got {!r}.".format(
+            quantities))
+    unknown = [q for q in quantities if q not in BATCH_QUANTITIES]
+    if unknown or not quantities:
+        raise BatchError("Unknown quantities {!r}, choose from {!r}.".format(unknown, BATCH_QUANTITIES))
+    return([H, Omega_vac, Omega_m] + w, quantities)
+
+
+def _batch_redshifts(req):
+    """
+    Read the cosmology, the requested quantities and the redshifts out of a /api/batch request. The body is
+    either JSON (an object with the cosmology and a 'redshifts' list), CSV (one redshift per line, with an
+    optional header line) or raw little-endian float64 (application/octet-stream), with the cosmology in the
+    query string for the last two.
+    """
+    mimetype = req.mimetype
+    if mimetype not in ('application/json', 'text/csv', 'application/octet-stream'):
+        raise BatchError("Unsupported Content-Type {!r}, use application/json, text/csv or "
+                         "application/octet-stream.".format(mimetype))
+    if mimetype == 'application/json':
+        body = req.get_json(silent=True)
+        if not isinstance(body, dict) or 'redshifts' not in body:
+            raise BatchError("Expected a JSON object with a 'redshifts' list.")
+        params, quantities = _batch_parameters(body)
+        try:
+            z = np.asarray(body['redshifts'], dtype=float).ravel()
+        except (TypeError, ValueError):
+            raise BatchError("'redshifts' must be a list of numbers.")
+        return(params, quantities, z)
+    params, quantities = _batch_parameters(req.args)
+    if mimetype == 'text/csv':
+        lines = req.get_data(as_text=True).splitlines()
+        if lines and lines[0].strip().lower() in ('z', 'redshift'):
+            lines = lines[1:]
+        try:
+            z = np.array([line.split(',')[0] for line in lines if line.strip()], dtype=float)
+        except ValueError as err:
+            raise BatchError("Invalid CSV redshift : {}".format(err))
+    else:
+        data = req.get_data()
+        if len(data) % 8 != 0:
+            raise BatchError("Binary input must be little-endian float64, got {} bytes.".format(len(data)))
+        z = np.frombuffer(data, dtype='<f8')
+    return(params, quantities, z)
+
+
+def _batch_format(req):
+    """
+    Choose the response format of /api/batch, from the 'format' query argument or the Accept header.
+    """
+    fmt = req.args.get('format')
+    if fmt is None:
+        fmt = {'text/csv': 'csv', 'application/octet-stream': 'binary'}.get(
+            req.accept_mimetypes.best_match(['application/json', 'text/csv', 'application/octet-stream']), 'json')
+    if fmt not in ('json', 'csv', 'binary'):
+        raise BatchError("Unknown format {!r}, choose from 'json', 'csv' or 'binary'.".format(fmt))
+    return(fmt)
+
+
+@app.route('/api/batch', methods=["POST"])
+def batch():
+    """
+    Compute distances and times for a whole catalog of redshifts in one vectorized pass, and return them
+    column by column, as JSON (an object of lists, with nan as null), CSV (one row per redshift) or raw
+    little-endian float64 (the columns one after the other, in the order given by the X-Columns header).
+    """
+    try:
+        params, quantities, z = _batch_redshifts(request)
+        fmt = _batch_format(request)
+    except BatchError as err:
+        return({'error': str(err)}, 400)
+    try:
+        outputs = offload(cf.compute_all, params, z)
+    except ComputeUnavailable as err:
+        return({'error': str(err)}, err.status)
+    columns = ['redshift'] + quantities
+    values = [z] + [np.broadcast_to(outputs[q], z.shape) for q in quantities]
+    if fmt == 'json':
+        body = {}
+        for name, col in zip(columns, values):
+            missing = np.isnan(col)
+            col = col.tolist()
+            for i in np.flatnonzero(missing):
+                col[i] = None
+            body[name] = col
+        return(Response(json.dumps(body), mimetype='application/json'))
+    if fmt == 'csv':
+        out = io.StringIO()
+        np.savetxt(out, np.column_stack(values), delimiter=',', header=','.join(columns), comments='', fmt='%.10g')
+        return(Response(out.getvalue(), mimetype='text/csv'))
+    body = b''.join(np.ascontiguousarray(col, dtype='<f8').tobytes() for col in values)
+    return(Response(body, mimetype='application/octet-stream', headers={'X-Columns': ','.join(columns)}))
+
+
+STREAM_CHUNK = 10000  # default number of redshifts computed at once by /api/stream
+
+
+def _stream_chunks(stream, mimetype, chunk_size):
+    """
+    Read redshifts incrementally from the request body, either CSV (one redshift per line, with an optional
+    header line) or raw little-endian float64, and yield them as arrays of at most chunk_size values.
+    """
+    if mimetype == 'application/octet-stream':
+        leftover = b''
+        while True:
+            data = stream.read(8 * chunk_size - len(leftover))
+            if not data:
+                break
+            data = leftover + data
+            usable = len(data) - len(data) % 8
+            leftover = data[usable:]
+            if usable:
+                yield np.frombuffer(data[:usable], dtype='<f8')
+        if leftover:
+            raise BatchError("Binary input must be little-endian float64, got {} trailing bytes.".format(len(leftover)))
+        return
+    chunk = []
+    for number, line in enumerate(stream):
+        line = line.split(b',')[0].strip()
+        if not line or (number == 0 and line.lower() in (b'z', b'redshift')):
+            continue
+        try:
+            chunk.append(float(line))
+        except ValueError:
+            raise BatchError("Invalid CSV redshift {!r} on line {}.".format(line.decode(errors='replace'), number + 1))
+        if len(chunk) == chunk_size:
+            yield np.array(chunk)
+            chunk = []
+    if chunk:
+        yield np.array(chunk)
+
+
+def _ndjson_rows(columns, values):
+    """
+    Format columns of values as newline-delimited JSON objects, one per row, with nan as null.
+    """
+    values = [col.tolist() for col in values]
+    rows = []
+    for row in zip(*values):
+        rows.append('{' + ', '.join('"{}": {}'.format(name, 'null' if v != v else repr(v))
+                                    for name, v in zip(columns, row)) + '}\n')
+    return(''.join(rows))
+
+
+@app.route('/api/stream', methods=["POST"])
+def stream():
+    """
+    Compute distances and times for a catalog of redshifts of any size, reading the request body and writing
+    the response chunk by chunk, so that memory use does not grow with the catalog. The cosmology and the
+    quantities are given in the query string as for /api/batch, the body is CSV or raw little-endian float64,
+    and the response is NDJSON (one object per redshift, the default) or CSV (with ?format=csv). Errors found
+    after the response has started are reported as a last {"error": ...} row (or a '# error' line in CSV).
+    """
+    try:
+        if request.mimetype not in ('text/csv', 'application/octet-stream'):
+            raise BatchError("Unsupported Content-Type {!r}, use text/csv or application/octet-stream.".format(
+                request.mimetype))
+        params, quantities = _batch_parameters(request.args)
+        fmt = request.args.get('format', 'ndjson')
+        if fmt not in ('ndjson', 'csv'):
+            raise BatchError("Unknown format {!r}, choose from 'ndjson' or 'csv'.".format(fmt))
+        chunk_size = request.args.get('chunk', STREAM_CHUNK)
+        if not str(chunk_size).isdigit() or int(chunk_size) < 1:
+            raise BatchError("chunk must be a positive integer, got {!r}.".format(chunk_size))
+        chunk_size = int(chunk_size)
+    except ValueError as err:
+        return({'error': str(err)}, 400)
+    columns = ['redshift'] + quantities
+    mimetype = request.mimetype
+
+    def generate():
+        if fmt == 'csv':
+            yield ','.join(columns) + '\n'
+        try:
+            for z in _stream_chunks(request.stream, mimetype, chunk_size):
+                outputs = offload(cf.compute_all, params, z)
+                values = [z] + [np.broadcast_to(outputs[q], z.shape) for q in quantities]
+                if fmt == 'csv':
+                    out = io.StringIO()
+                    np.savetxt(out, np.column_stack(values), delimiter=',', fmt='%.10g')
+                    yield out.getvalue()
+                else:
+                    yield _ndjson_rows(columns, values)
+        except (BatchError, ComputeUnavailable) as err:
+            yield ('# error : {}\n' if fmt == 'csv' else '{{"error": {}}}\n').format(json.dumps(str(err)))
+
+    return(Response(stream_with_context(generate()),
+                    mimetype='text/csv' if fmt == 'csv' else 'application/x-ndjson'))
+
+
+@app.route('/health')
+def health():
+    """
+    Report the state of the computation executor : its configuration, the counts of submitted, completed,
+    failed, rejected and timed out computations, the number in flight, and the median and 99th percentile
+    latency (in seconds) of the most recent computations, along with the counters of the shared result cache.
+    The status is 503 while the executor is full.
+    """
+    with _metrics_lock:
+        body = dict(_metrics)
+        latencies = np.array(_latencies)
+    body.update(executor=EXECUTOR, workers=WORKERS, max_in_flight=MAX_IN_FLIGHT, timeout=TIMEOUT)
+    body['latency_p50'], body['latency_p99'] = (np.percentile(latencies, [50, 99]).tolist() if len(latencies)
+                                                else (None, None))
+    cache = _get_result_cache()
+    body['result_cache'] = cache.info() if cache is not None else None
+    body['status'] = 'busy' if body['in_flight'] >= MAX_IN_FLIGHT else 'ok'
+    return(body, 503 if body['status'] == 'busy' else 200)
+
+
+# COSMOCALC_INSTRUMENT=1 records the call counts, wall times and integrator work of cosmoFuncs and of home(),
+# served by /metrics (including the work of the worker processes with COSMOCALC_EXECUTOR=process). Without it,
+# nothing is wrapped and /metrics reports zeros.
+INSTRUMENT = os.environ.get('COSMOCALC_INSTRUMENT', '') not in ('', '0')
+if INSTRUMENT:
+    cf.enable_instrumentation()
+    app.view_functions['home'] = cf.instrumented(home, 'flask_app.home')
+
+
+@app.route('/metrics')
+def metrics():
+    """
+    Report the instrumentation statistics of cosmoFuncs (see cf.instrumentation_stats()) and the counters
+    of the computation executor, in the Prometheus text format.
+    """
+    lines = [cf.prometheus_metrics()]
+    with _metrics_lock:
+        counters = dict(_metrics)
+    for name, value in sorted(counters.items()):
+        kind = 'gauge' if name == 'in_flight' else 'counter'
+        metric = 'cosmocalc_{}{}'.format(name, '' if kind == 'gauge' else '_total')
+        lines.append('# TYPE {} {}\n{} {}\n'.format(metric, kind, metric, value))
+    return(Response(''.join(lines), mimetype='text/plain; version=0.0.4'))
+
+
 @app.route('/about/')
 def about():
     return render_template("about.html")
 
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    app.run(debug=True, threaded=True)
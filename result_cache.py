@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+A persistent cache for the results of cosmoFuncs.compute_all(), stored in an SQLite file so that every
+worker process of the web server shares it and it survives restarts.
+
+Entries are keyed on a canonical (H_0, omega_m, omega_lam, model, z) tuple and expire after a time-to-live.
+When the cache holds more than max_entries entries, the least recently used ones are evicted. The hit,
+miss, expiry and eviction counters are kept in the same file, so they cover all the workers. So that a hit
+only reads the file, the hit and miss counts and the access times are kept in memory and written in one
+transaction every flush_every lookups or flush_interval seconds, and before every insertion.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL,
+                                    created REAL NOT NULL, accessed REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+_COUNTERS = ('hits', 'misses', 'expired', 'evictions')
+
+
+def canonical_key(H_0, omega_m, omega_lam, z_val, model='lcdm'):
+    """
+    A function to build the cache key of a query, rounding the parameters so that equal values written
+    differently (70, '70.0', 70.00000000000001) share one entry.
+
+    Arguments
+    ---------
+    H_0, omega_m, omega_lam : float
+        The Hubble parameter (in units of km/s/Mpc) and the density parameters.
+
+    z_val : float
+        The redshift.
+
+    model : str, optional
+        The name of the cosmological model. Defaults to 'lcdm'.
+
+    Returns
+    -------
+    key : str
+        The key, as a JSON list.
+
+    """
+    values = [float('{:.12g}'.format(float(v))) for v in (H_0, omega_m, omega_lam)]
+    return(json.dumps(values + [model, float('{:.12g}'.format(float(z_val)))]))
+
+
+class ResultCache:
+    """
+    A class giving access to the SQLite result cache. Each thread uses its own connection, and the file is
+    opened in write-ahead-log mode so that readers in other processes are not blocked by writers.
+
+    Arguments
+    ---------
+    path : str
+        The path of the SQLite file, created if needed.
+
+    ttl : float, optional
+        The time-to-live of an entry, in seconds. Defaults to 30 days. None keeps entries forever.
+
+    max_entries : int, optional
+        The largest number of entries kept. Defaults to 100000.
+
+    evict_every : int, optional
+        How many insertions (in one process) happen between two checks of the size and TTL limits. Defaults
+        to 100.
+
+    flush_every : int, optional
+        How many lookups (in one process) are counted in memory before the counters and access times are
+        written to the file. Defaults to 100.
+
+    flush_interval : float, optional
+        The longest time (in seconds) the counters and access times are kept in memory. Defaults to 5.
+
+    """
+
+    def __init__(self, path, ttl=30 * 86400.0, max_entries=100000, evict_every=100, flush_every=100,
+                 flush_interval=5.0):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.evict_every = evict_every
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._puts = 0
+        # the hits, misses and access times not yet written to the file
+        self._pending_lock = threading.Lock()
+        self._pending = {'hits': 0, 'misses': 0}
+        self._accessed = {}
+        self._flushed = time.time()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connection() as db:
+            db.executescript(_SCHEMA)
+            db.executemany("INSERT OR IGNORE INTO counters VALUES (?, 0)", [(name,) for name in _COUNTERS])
+
+    def _connection(self):
+        db = getattr(self._local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=30.0)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db = db
+        return(db)
+
+    @staticmethod
+    def _count(db, name, delta=1):
+        db.execute("UPDATE counters SET value = value + ? WHERE name = ?", (delta, name))
+
+    def get(self, key):
+        """Return the value stored under key, or None if there is none or it has expired."""
+        now = time.time()
+        db = self._connection()
+        row = db.execute("SELECT value, created FROM results WHERE key = ?", (key,)).fetchone()
+        if row is not None and self.ttl is not None and now - row[1] > self.ttl:
+            with db:
+                db.execute("DELETE FROM results WHERE key = ?", (key,))
+                self._count(db, 'expired')
+            row = None
+        with self._pending_lock:
+            if row is None:
+                self._pending['misses'] += 1
+            else:
+                self._pending['hits'] += 1
+                self._accessed[key] = now
+            due = (sum(self._pending.values()) >= self.flush_every or now - self._flushed >= self.flush_interval)
+        if due:
+            self.flush()
+        return(None if row is None else json.loads(row[0]))
+
+    def flush(self):
+        """Write the hit and miss counts and the access times kept in memory to the file."""
+        with self._pending_lock:
+            pending, accessed = self._pending, self._accessed
+            self._pending, self._accessed = {'hits': 0, 'misses': 0}, {}
+            self._flushed = time.time()
+        if not accessed and not any(pending.values()):
+            return
+        with self._connection() as db:
+            db.executemany("UPDATE results SET accessed = MAX(accessed, ?) WHERE key = ?",
+                           [(when, key) for key, when in accessed.items()])
+            for name, delta in pending.items():
+                if delta:
+                    self._count(db, name, delta)
+
+    def put(self, key, value):
+        """Store value (anything JSON serializable) under key, evicting entries every evict_every calls."""
+        self.flush()
+        now = time.time()
+        with self._connection() as db:
+            db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", (key, json.dumps(value), now, now))
+        self._puts += 1
+        if self._puts % self.evict_every == 0:
+            self.evict()
+
+    def evict(self):
+        """Drop the expired entries, then the least recently used ones beyond max_entries."""
+        self.flush()
+        with self._connection() as db:
+            if self.ttl is not None:
+                self._count(db, 'expired', db.execute("DELETE FROM results WHERE created < ?",
+                                                      (time.time() - self.ttl,)).rowcount)
+            excess = db.execute("SELECT COUNT(*) FROM results").fetchone()[0] - self.max_entries
+            if excess > 0:
+                db.execute("DELETE FROM results WHERE key IN "
+                           "(SELECT key FROM results ORDER BY accessed LIMIT ?)", (excess,))
+                self._count(db, 'evictions', excess)
+
+    def clear(self):
+        """Drop every entry and reset the counters."""
+        with self._pending_lock:
+            self._pending, self._accessed = {'hits': 0, 'misses': 0}, {}
+        with self._connection() as db:
+            db.execute("DELETE FROM results")
+            db.execute("UPDATE counters SET value = 0")
+
+    def info(self):
+        """Return the counters, the hit rate, the current size and the limits as a dict."""
+        self.flush()
+        db = self._connection()
+        info = dict(db.execute("SELECT name, value FROM counters").fetchall())
+        info['size'] = db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        lookups = info['hits'] + info['misses']
+        info['hit_rate'] = info['hits'] / lookups if lookups else None
+        info.update(max_entries=self.max_entries, ttl=self.ttl, path=self.path)
+        return(info)
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the array path of cosmoFuncs (one cumulative integral over the sorted redshifts) against the
+single-redshift quad path.
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import cosmoFuncs as cf  # noqa: E402
+
+COSMOLOGIES = [[70.0, 0.7, 0.3], [70.0, 0.9, 0.3], [70.0, 0.2, 0.3], [70.0, 0.0, 0.3],
+               [70.0, 0.7, 0.3, -0.9, 0.2]]
+REDSHIFTS = np.array([-0.3, 1e-4, 0.05, 0.5, 1.0, 3.0, 10.0, 1100.0])
+FUNCTIONS = ('comoving_distance_radial', 'comoving_distance_transverse', 'comoving_volume',
+             'angulardiameter_distance', 'linear_scale', 'luminosity_distance', 't', 'lightTravelTime')
+
+
+@pytest.mark.parametrize('parameters', COSMOLOGIES)
+def test_array_integrals_match_quad(parameters):
+    cosmo = cf.get_cosmology(parameters)
+    radial = np.array([cosmo._radial_scalar(z) for z in REDSHIFTS])
+    age = np.array([cosmo._age_scalar(z) for z in REDSHIFTS])
+    np.testing.assert_allclose(cf._cumulative_integral(cf._LnIntegrand(cosmo, 1), REDSHIFTS), radial, rtol=1e-8)
+    np.testing.assert_allclose(cf._cumulative_integral(cf._LnIntegrand(cosmo, 0), REDSHIFTS,
+                                                       tail=cosmo._age_numeric), age, rtol=1e-8)
+
+
+@pytest.mark.parametrize('parameters', COSMOLOGIES)
+def test_array_functions_match_scalars(parameters):
+    cosmo = cf.get_cosmology(parameters)
+    for name in FUNCTIONS:
+        function = getattr(cosmo, name)
+        values = function(REDSHIFTS)
+        assert values.shape == REDSHIFTS.shape
+        np.testing.assert_allclose(values, [function(z) for z in REDSHIFTS], rtol=1e-8, err_msg=name)
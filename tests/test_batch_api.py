@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the /api/batch endpoint of flask_app.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import flask_app  # noqa: E402
+
+COSMOLOGY = {'H0': 70, 'omega_m': 0.3, 'omega_lam': 0.7}
+
+
+@pytest.fixture
+def client():
+    return(flask_app.app.test_client())
+
+
+def test_batch_quantities(client):
+    for quantities in (['luminosity_distance', 'age'], 'luminosity_distance, age'):
+        response = client.post('/api/batch', json=dict(COSMOLOGY, redshifts=[0.5, 1.0], quantities=quantities))
+        assert response.status_code == 200
+        assert len(response.get_json()['luminosity_distance']) == 2
+
+
+@pytest.mark.parametrize('quantities', [5, None, {'age': 1}, ['age', 5], 'volume', []])
+def test_batch_invalid_quantities(client, quantities):
+    response = client.post('/api/batch', json=dict(COSMOLOGY, redshifts=[0.5, 1.0], quantities=quantities))
+    assert response.status_code == 400
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the closed forms of the distance and age integrals of cosmoFuncs against quad.
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import cosmoFuncs as cf  # noqa: E402
+
+REDSHIFTS = [-0.3, 1e-4, 0.05, 0.5, 1.0, 3.0, 10.0, 1100.0]
+
+
+@pytest.fixture(autouse=True)
+def tight_quad():
+    previous = cf.set_integrator()
+    cf.set_integrator('quad', 1e-12)
+    yield
+    cf.set_integrator(**previous)
+
+
+@pytest.mark.parametrize('parameters', [[70.0, 0.0, 0.3], [70.0, 0.0, 0.05], [70.0, 0.0, 2.0]])
+def test_analytic_matches_quad(parameters):
+    cosmo = cf.Cosmology(*parameters)
+    assert cosmo.paths == {'radial': 'analytic', 'age': 'analytic'}
+    for z in REDSHIFTS:
+        np.testing.assert_allclose(cosmo.radial_integral(z), cosmo._radial_scalar(z), rtol=1e-8)
+        np.testing.assert_allclose(cosmo.age_integral(z), cosmo._age_scalar(z), rtol=1e-8)
+    np.testing.assert_allclose(cosmo.radial_integral(np.array(REDSHIFTS)),
+                               [cosmo._radial_scalar(z) for z in REDSHIFTS], rtol=1e-8)
+
+
+@pytest.mark.parametrize('parameters', [[70.0, 0.7, 0.3], [67.66, 0.6889, 0.3111], [70.0, 0.9, 0.3],
+                                        [70.0, 0.2, 0.3], [70.0, 0.8, 0.5]])
+def test_elliptic_matches_quad(parameters):
+    cosmo = cf.Cosmology(*parameters)
+    assert cosmo.paths['radial'] == 'elliptic'
+    for z in REDSHIFTS:
+        np.testing.assert_allclose(cosmo._elliptic_radial(z), cosmo._radial_scalar(z), rtol=1e-8)
+    np.testing.assert_allclose(cosmo._elliptic_radial(np.array(REDSHIFTS)),
+                               [cosmo._radial_scalar(z) for z in REDSHIFTS], rtol=1e-8)
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the instrumentation of cosmoFuncs.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import cosmoFuncs as cf  # noqa: E402
+
+PARAMETERS = [70.0, 0.7, 0.3, -0.9, 0.2]  # a w0-wa model, integrated with quad
+
+
+def test_block_stats():
+    with cf.instrument() as stats:
+        cf.get_cosmology(PARAMETERS).t(2.0)
+    assert stats['quad_calls'] > 0 and stats['quad_abserr_max'] > 0
+    with cf.instrument() as stats:
+        pass
+    assert stats['quad_calls'] == 0 and stats['quad_abserr_max'] == 0
+    assert stats['functions'] == {}
+
+
+def test_stand_in_outlives_disable():
+    cf.enable_instrumentation()
+    counting_quad = cf.quad
+    cf.disable_instrumentation()
+    # a call still inside the stand-in when instrumentation is disabled keeps its original
+    value, abserr = counting_quad(lambda x: x ** 2, 0.0, 1.0)
+    assert abs(value - 1 / 3) < 1e-12
+    assert cf.quad is not counting_quad
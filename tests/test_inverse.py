@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the inverse lookups of cosmoFuncs, the redshift from a distance, an age or a lookback time.
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import cosmoFuncs as cf  # noqa: E402
+
+REDSHIFTS = np.concatenate((np.geomspace(1e-3, 1000, 60), np.random.default_rng(0).uniform(0, 5, 200)))
+INVERSES = (('z_at_comoving_distance', 'comoving_distance_radial'),
+            ('z_at_luminosity_distance', 'luminosity_distance'), ('z_at_age', 't'),
+            ('z_at_lookback_time', 'lightTravelTime'))
+
+
+@pytest.mark.parametrize('parameters', [[70.0, 0.7, 0.3], [70.0, 0.9, 0.3], [70.0, 0.2, 0.3],
+                                        [70.0, 0.7, 0.3, -0.9, 0.2]])
+def test_inverse_round_trip(parameters):
+    cosmo = cf.get_cosmology(parameters)
+    for inverse, forward in INVERSES:
+        values = getattr(cosmo, forward)(REDSHIFTS)
+        z_val = getattr(cf, inverse)(parameters, values)
+        assert np.isfinite(z_val).all(), inverse
+        np.testing.assert_allclose(getattr(cosmo, forward)(z_val), values, rtol=1e-8, err_msg=inverse)
+        # a single value gives a single redshift
+        assert np.ndim(getattr(cf, inverse)(parameters, values[0])) == 0
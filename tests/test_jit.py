@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the choice of integration kernel of cosmoFuncs.
+"""
+import importlib.util
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import cosmoFuncs as cf  # noqa: E402
+
+
+def test_set_jit_without_numba(monkeypatch):
+    monkeypatch.setattr(importlib.util, 'find_spec', lambda name: None)
+    with pytest.warns(RuntimeWarning, match='numba is not installed'):
+        assert cf.set_jit(True) is False
+    assert cf._JIT['enabled'] is False
+    assert cf.set_jit(False) is False
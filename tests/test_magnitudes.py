@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the distance modulus and absolute magnitudes of cosmoFuncs.
+"""
+import os
+import sys
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import cosmoFuncs as cf  # noqa: E402
+
+PARAMETERS = [70.0, 0.7, 0.3]
+
+
+def test_list_inputs():
+    z = [0.5, 1.0]
+    expected = cf.distance_modulus(PARAMETERS, np.array(z))
+    for source in (cf.get_cosmology(PARAMETERS), cf.get_table(PARAMETERS)):
+        np.testing.assert_allclose(source.distance_modulus(z), expected)
+        np.testing.assert_allclose(source.absolute_magnitude([20, 21], z), [20, 21] - expected)
+        np.testing.assert_allclose(source.absolute_magnitude(20, z), 20 - expected)
+        np.testing.assert_allclose(source.absolute_magnitude([20, 21], 0.5), np.array([20, 21]) - expected[0])
+    np.testing.assert_allclose(cf.distance_modulus(PARAMETERS, z), expected)
+    np.testing.assert_allclose(cf.absolute_magnitude(PARAMETERS, [20, 21], z), [20, 21] - expected)
+
+
+def test_sweep_distance_modulus_at_zero():
+    z = np.array([0.0, 0.5, 1.0])
+    sweep = cf.RedshiftSweep(z)
+    for parameters in ([70.0, 0.7, 0.3], [70.0, 0.2, 0.3], [70.0, 1.2, 0.3]):
+        with warnings.catch_warnings():
+            warnings.simplefilter('error')
+            mu = sweep.evaluate([parameters], 'distance_modulus')[0]
+            expected = cf.distance_modulus(parameters, z)
+        assert mu[0] == -np.inf
+        np.testing.assert_allclose(mu, expected)
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the /metrics endpoint of flask_app.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import cosmoFuncs as cf  # noqa: E402
+import flask_app  # noqa: E402
+
+
+@pytest.fixture
+def process_executor(monkeypatch):
+    monkeypatch.setattr(flask_app, 'EXECUTOR', 'process')
+    monkeypatch.setattr(flask_app, 'WORKERS', 1)
+    monkeypatch.setattr(flask_app, 'INSTRUMENT', True)
+    monkeypatch.setattr(flask_app, '_executor', None)
+    yield
+    flask_app._get_executor().shutdown()
+
+
+def test_metrics_include_worker_processes(process_executor):
+    before = cf.instrumentation_stats()
+    # a w0-wa model, whose single redshifts are integrated with quad
+    outputs = flask_app.offload(cf.compute_all, [70.0, 0.7, 0.3, -0.9, 0.2], 1.5)
+    assert outputs['age'] > 0
+    flask_app._get_executor().shutdown()  # waits for the statistics to be merged
+    after = cf.instrumentation_stats()
+    assert after['quad_calls'] > before['quad_calls']
+    assert after['functions']['compute_all']['calls'] > before['functions'].get('compute_all', {'calls': 0})['calls']
+    text = flask_app.app.test_client().get('/metrics').get_data(as_text=True)
+    assert 'cosmofuncs_quad_calls_total {!r}'.format(float(after['quad_calls'])) in text
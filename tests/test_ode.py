@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the single ODE integration of cosmoFuncs (compute_all(..., method='ode')).
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import cosmoFuncs as cf  # noqa: E402
+
+PARAMETERS = [70.0, 0.7, 0.3]
+QUANTITIES = ('comoving_distance_radial', 'light_travel_time', 'age')
+
+
+@pytest.mark.parametrize('z', [np.array([]), np.array([np.nan]), np.array([np.nan, np.inf])])
+def test_ode_without_finite_redshifts(z):
+    results = cf.compute_all(PARAMETERS, z, method='ode')
+    for name in QUANTITIES:
+        assert results[name].shape == z.shape
+        assert np.isnan(results[name]).all()
+
+
+def test_ode_scalar_nan():
+    results = cf.compute_all(PARAMETERS, float('nan'), method='ode')
+    for name in QUANTITIES:
+        assert np.ndim(results[name]) == 0 and np.isnan(results[name])
+
+
+def test_ode_mixed_finite_and_nan():
+    z = np.array([0.5, np.nan, -0.2, 1.0, np.nan, 3.0])
+    finite = np.isfinite(z)
+    ode = cf.compute_all(PARAMETERS, z, method='ode')
+    integral = cf.compute_all(PARAMETERS, z[finite], method='integral')
+    for name in QUANTITIES:
+        assert np.isnan(ode[name][~finite]).all()
+        np.testing.assert_allclose(ode[name][finite], integral[name], rtol=1e-8)
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the pair separations and the pair finder of cosmoFuncs.
+"""
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import cosmoFuncs as cf  # noqa: E402
+
+PARAMETERS = [70.0, 0.7, 0.3]
+
+
+def deep_catalog(n=4000, seed=1):
+    """
+    Random objects in a 2x2 degree field, over a deep redshift range.
+    """
+    rng = np.random.default_rng(seed)
+    return(rng.uniform(150, 152, n), rng.uniform(1, 3, n), rng.uniform(0.01, 5.0, n))
+
+
+def test_kdtree_matches_brute():
+    ra, dec, z = deep_catalog()
+    for physical in (True, False):
+        kdtree = cf.find_pairs(PARAMETERS, ra, dec, z, 2.0, pi_max=20.0, physical=physical, chunk=5000)
+        brute = cf.find_pairs(PARAMETERS, ra, dec, z, 2.0, pi_max=20.0, physical=physical, method='brute')
+        assert len(kdtree['i']) > 0
+        np.testing.assert_array_equal(kdtree['i'], brute['i'])
+        np.testing.assert_array_equal(kdtree['j'], brute['j'])
+        for name in cf.PAIR_SEPARATIONS:
+            np.testing.assert_allclose(kdtree[name], brute[name])
+
+
+def test_kdtree_candidates_bounded():
+    ra, dec, z = deep_catalog()
+    r_max, pi_max, chunk = 2.0, 20.0, 5000
+    objects = cf._object_distances(PARAMETERS, ra, dec, z)
+    radius = np.hypot(r_max, pi_max) * (1 + z)
+    sizes = [len(i) for i, j in cf._candidate_pairs_kdtree(objects, radius, chunk)]
+    # every chunk of candidates is bounded, and each pair is a candidate once
+    assert len(sizes) > 1
+    assert max(sizes) <= chunk
+    # the radius of each object follows its own redshift, rather than the highest one of the catalog
+    from scipy.spatial import cKDTree
+    d_C, dec_r, ra_r = objects[3], objects[1], objects[0]
+    positions = np.column_stack((d_C * np.cos(dec_r) * np.cos(ra_r), d_C * np.cos(dec_r) * np.sin(ra_r),
+                                 d_C * np.sin(dec_r)))
+    assert sum(sizes) < len(cKDTree(positions).query_pairs(radius.max(), output_type='ndarray')) / 2
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the SQLite result cache.
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from result_cache import ResultCache  # noqa: E402
+
+
+def test_hits_only_read(tmp_path):
+    cache = ResultCache(str(tmp_path / 'results.sqlite'), flush_every=1000, flush_interval=3600)
+    cache.put('a', {'d_L': 1.0})
+    statements = []
+    cache._connection().set_trace_callback(statements.append)
+    for _ in range(10):
+        assert cache.get('a') == {'d_L': 1.0}
+    assert cache.get('b') is None
+    assert all(statement.startswith('SELECT') for statement in statements)
+    info = cache.info()
+    assert (info['hits'], info['misses']) == (10, 1)
+
+
+def test_eviction_uses_pending_access_times(tmp_path):
+    cache = ResultCache(str(tmp_path / 'results.sqlite'), max_entries=2, evict_every=1, flush_every=1000,
+                        flush_interval=3600)
+    cache.put('a', 1)
+    cache.put('b', 2)
+    cache.get('a')
+    cache.put('c', 3)
+    assert (cache.get('a'), cache.get('b'), cache.get('c')) == (1, None, 3)
@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""
+Tests of the RedshiftSweep evaluation of many cosmologies at fixed redshifts.
+"""
+import os
+import sys
+
+import numpy as np
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+import cosmoFuncs as cf  # noqa: E402
+
+PARAMS = [[70.0, 0.7, 0.3, -1.0, 0.0], [70.0, 0.2, 0.3, -1.0, 0.0], [70.0, 1.2, 0.3, -1.0, 0.0],
+          [70.0, 0.7, 0.3, -0.9, 0.2]]
+
+
+@pytest.mark.parametrize('z', [np.array([]), np.empty((0, 3)), np.array([np.nan, np.inf])])
+def test_sweep_without_finite_redshifts(z):
+    sweep = cf.RedshiftSweep(z)
+    for quantity in cf.RedshiftSweep.QUANTITIES:
+        values = sweep.evaluate(PARAMS, quantity)
+        assert values.shape == (len(PARAMS),) + z.shape
+        assert np.isnan(values).all()
+
+
+def test_sweep_matches_luminosity_distance():
+    z = np.array([[0.01, 0.5], [np.nan, 3.0]])
+    values = cf.RedshiftSweep(z).evaluate(PARAMS)
+    for row, parameters in zip(values, PARAMS):
+        np.testing.assert_allclose(row, cf.luminosity_distance(parameters, z), rtol=1e-10)